@@ -2,52 +2,15 @@ import streamlit as st
 from app.utils import load_dotenv_safe
 load_dotenv_safe()
 from app.crew_wrapper import CultureCrew
-from app.agents import continue_text
-import io
+from app.agents import SECTION_LABELS, followup_questions, warm_up_model
+from app.cultures import canonicalize_culture
+from app.snapshot import load_default_snapshot
 import re
+import uuid
 from datetime import datetime
 
-# Optional PDF support
-try:
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib.pagesizes import letter
-
-    PDF_SUPPORTED = True
-
-    def make_pdf_bytes(title: str, text: str) -> bytes:
-        """Return nicely formatted PDF bytes using reportlab.platypus."""
-        bio = io.BytesIO()
-        doc = SimpleDocTemplate(bio, pagesize=letter, title=title)
-        styles = getSampleStyleSheet()
-        story = []
-
-        # Title
-        story.append(Paragraph(title, styles["Title"]))
-        story.append(Spacer(1, 12))
-
-        # If the text contains markdown-style headings, keep them as headings.
-        for line in text.splitlines():
-            s = line.strip()
-            if not s:
-                story.append(Spacer(1, 6))
-                continue
-            # heading-like line
-            if s.endswith(":") or s.isupper() or s.startswith("# ") or s.startswith("## "):
-                heading = s.replace("#", "").strip()
-                story.append(Paragraph(heading, styles["Heading3"]))
-            else:
-                # simple body text
-                # escape ampersands
-                safe = s.replace("&", "&amp;")
-                story.append(Paragraph(safe, styles["BodyText"]))
-            story.append(Spacer(1, 6))
-
-        doc.build(story)
-        bio.seek(0)
-        return bio.read()
-except Exception:
-    PDF_SUPPORTED = False
+# Optional PDF support (reportlab is imported on the first export, not at startup)
+from app.pdf import PDF_SUPPORTED, get_pdf_bytes, pdf_key
 
 
 def sanitize_filename(name: str) -> str:
@@ -65,68 +28,86 @@ def _html_escape(text: str) -> str:
     )
 
 
-def _looks_cutoff(text: str) -> bool:
-    if not text:
-        return False
-    s = text.strip()
-    if s.endswith("..."):
-        return True
-    if s[-1] not in ".!?\"'”’":
-        return len(s) > 80
-    return False
-
-
-def merge_texts(original: str, continuation: str) -> str:
-    """Merge original + continuation while removing overlapping repeated fragments.
-
-    Strategy:
-    - try to find a character-level overlap between the end of `original` and start of `continuation` (up to 200 chars)
-    - if none, try to find word-level overlap (up to 20 words)
-    - if still none, just append with a space
+NOTES_PAGE_SIZE = 20
+
+
+def _load_notes(username: str, version, cursor=None):
+    """Fetch a page of notes after `cursor` and append it to the ones already shown."""
+    page = get_crew().get_notes(username, limit=NOTES_PAGE_SIZE, cursor=cursor)
+    loaded = st.session_state.get("notes_loaded", []) if cursor else []
+    st.session_state["notes_loaded"] = loaded + page["notes"]
+    st.session_state["notes_cursor"] = page["next_cursor"]
+    st.session_state["notes_loaded_version"] = version
+
+
+@st.cache_resource
+def get_crew() -> CultureCrew:
+    """One CultureCrew per server process, shared by every session and rerun."""
+    load_default_snapshot()
+    warm_up_model()
+    return CultureCrew()
+
+
+def pdf_download_button(label: str, title: str, text: str, file_name: str, key: str):
+    """Offer a PDF download, rendering it only after the user asks for it.
+
+    Rendering runs on the shared PDF worker pool and is cached by content, so reruns
+    (and the /export/pdf API) reuse the same document until the text changes.
     """
-    if not continuation:
-        return original or ""
-    if not original:
-        return continuation.strip()
-
-    a = original.rstrip()
-    b = continuation.lstrip()
-
-    # normalize for matching (lowercase, collapse spaces)
-    def norm(s: str) -> str:
-        return re.sub(r"\s+", " ", s.strip().lower())
-
-    na = norm(a)
-    nb = norm(b)
-
-    # try char-level overlap
-    max_chars = min(200, len(na), len(nb))
-    for k in range(max_chars, 20, -1):
-        if na.endswith(nb[:k]):
-            # remove overlap from b
-            return (a + b[k:]).strip()
-
-    # try word-level overlap
-    a_words = na.split()
-    b_words = nb.split()
-    max_words = min(20, len(a_words), len(b_words))
-    for k in range(max_words, 0, -1):
-        if a_words[-k:] == b_words[:k]:
-            # compute char index in b where overlap ends
-            # find the substring corresponding to first k words of original b (before normalization use)
-            # fallback: remove the matched prefix from b by word
-            b_word_list = b.split()
-            # remove first k words from b
-            new_b = " ".join(b_word_list[k:])
-            return (a + " " + new_b).strip()
-
-    # nothing matched — just append with a single space
-    return (a + " " + b).strip()
-
-crew = CultureCrew()
+    token = pdf_key(title, text)
+    if st.session_state.get(f"{key}_requested") != token:
+        if not st.button(f"Prepare {label}", key=f"{key}_prepare"):
+            return
+        st.session_state[f"{key}_requested"] = token
+    with st.spinner("Rendering PDF..."):
+        data = get_pdf_bytes(title, text)
+    st.download_button(label, data, file_name=sanitize_filename(file_name), mime="application/pdf", key=key)
+
+
+@st.cache_data(show_spinner=False, ttl=600, max_entries=256)
+def cached_related_resources(country: str):
+    return get_crew().get_related_resources(country)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_notes_text(username: str, notes_version) -> str:
+    """All of a user's notes as one text file; `notes_version` changes when a note is saved."""
+    return "".join(
+        f"Title: {n['title']}\nCulture: {n['culture']}\nSaved: {n['created_at']}\n\n{n['content']}\n\n---\n\n"
+        for n in get_crew().iter_notes(username)
+    )
+
 
 st.set_page_config(page_title="AI Culture Companion", layout="wide")
 
+crew = get_crew()
+
+
+def _add_summary_section(label: str):
+    """Generate (or fetch from cache) a section left out of the current custom summary."""
+    last = st.session_state.get("last_summary")
+    if not last:
+        return
+    field = SECTION_LABELS[label]
+    try:
+        last[field] = crew.fill_summary_section(st.session_state["last_summary_culture"], sidebar_user, label,
+                                                verbosity=st.session_state.get("last_summary_verbosity", "medium"))
+    except Exception as e:
+        st.session_state["section_error"] = f"Could not load {label}: {e}"
+        return
+    last["missing"] = [name for name in last.get("missing", []) if name != field]
+    st.session_state["last_summary"] = last
+
+
+def _suggest_followup(question: str):
+    st.session_state["followup_area_sidebar"] = question
+
+
+def _new_conversation(username: str, culture: str, persona: str):
+    crew.reset_conversation(username, culture, persona)
+    st.session_state.pop("last_chat", None)
+    st.session_state.pop("last_chat_meta", None)
+
 
 
 # Aesthetic, professional, and visually pleasing CSS overhaul
@@ -271,12 +252,19 @@ if not PDF_SUPPORTED:
 
 # Sidebar: keep defaults but remove visible settings controls
 sidebar_user = "user123"
+# Conversations live server-side and the crew is shared by every browser session, so
+# persona chats are keyed by a per-session id; otherwise visitors would share one history.
+if "conversation_id" not in st.session_state:
+    st.session_state["conversation_id"] = uuid.uuid4().hex
+chat_owner = f"{sidebar_user}#{st.session_state['conversation_id']}"
 sidebar_verbosity = "medium"
 
 tab1, tab2, tab3 = st.tabs(["Cultural Summary", "Persona Chat", "Your Notes"])
 
 with tab1:
     st.header("Cultural Summary")
+    # Filled token by token while a summary streams in, then cleared for the full render below
+    summary_stream_area = st.empty()
     # Main output column (full width in content area) — summary is not scrollable
     # Removed misplaced outer card; only wrap actual content sections in cards
 
@@ -294,7 +282,7 @@ with tab1:
         username = sidebar_user
 
         # Custom section selection
-        custom_sections = {"Summary": True, "Etiquette": True, "Communication Style": True}
+        custom_sections = {"Summary": True, "Etiquette": True, "Communication Style": True, "Recommendations": False}
         selected_sections = []
         if verbosity == "custom":
             st.markdown('<div class="pro-label">Select Sections to Include</div>', unsafe_allow_html=True)
@@ -311,11 +299,19 @@ with tab1:
             if not culture.strip():
                 st.error("Please enter a culture.")
             else:
-                with st.spinner("Generating summary..."):
-                    if verbosity == "custom":
-                        result = crew.generate_summary_with_verbosity(culture, username, verbosity=verbosity, sections=selected_sections)
-                    else:
-                        result = crew.generate_summary_with_verbosity(culture, username, verbosity=verbosity)
+                summary_stream_area.info("Generating summary...")
+                sections_arg = selected_sections if verbosity == "custom" else None
+                streamed, result = "", None
+                for event in crew.stream_summary_with_verbosity(culture, username, verbosity=verbosity, sections=sections_arg):
+                    if event["event"] == "delta":
+                        streamed += event["text"]
+                        summary_stream_area.markdown(streamed)
+                    elif event["event"] == "done":
+                        result = event["result"]
+                summary_stream_area.empty()
+                if result is not None:
+                    # the sidebar offers the templated follow-ups next, so answer them ahead of time
+                    crew.warm_followups(culture, verbosity)
                     st.session_state["last_summary"] = result
                     st.session_state["last_summary_culture"] = culture
                     st.session_state["last_summary_verbosity"] = verbosity
@@ -327,28 +323,24 @@ with tab1:
     with st.sidebar.expander("Suggested Follow-up Questions", expanded=False):
         st.markdown('<div class="small muted">Suggested follow-ups</div>', unsafe_allow_html=True)
         if culture:
-            s1 = f"What gestures are considered rude in {culture}?"
-            s2 = f"How do I greet someone older in {culture}?"
-            s3 = f"What dress considerations should I know when visiting {culture}?"
+            s1, s2, s3 = followup_questions(canonicalize_culture(culture))
         else:
             s1 = "What gestures are considered rude in this culture?"
             s2 = "How do I greet someone older in this culture?"
             s3 = "What dress considerations should I know when visiting?"
 
-        if st.button(s1, key="sugg1_sidebar"):
-            st.session_state["followup_question"] = s1
-        if st.button(s2, key="sugg2_sidebar"):
-            st.session_state["followup_question"] = s2
-        if st.button(s3, key="sugg3_sidebar"):
-            st.session_state["followup_question"] = s3
+        # suggestions fill the question box through its widget key, so the box shows them on this rerun
+        st.button(s1, key="sugg1_sidebar", on_click=_suggest_followup, args=(s1,))
+        st.button(s2, key="sugg2_sidebar", on_click=_suggest_followup, args=(s2,))
+        st.button(s3, key="sugg3_sidebar", on_click=_suggest_followup, args=(s3,))
 
-        followup = st.text_area("Follow-up question", value=st.session_state.get("followup_question", ""), key="followup_area_sidebar")
+        followup = st.text_area("Follow-up question", key="followup_area_sidebar")
         if st.button("Ask Follow-up (Persona)", key="ask_followup_sidebar"):
             if not (culture.strip() and followup.strip()):
                 st.error("Provide a culture and a follow-up question first.")
             else:
                 with st.spinner("Asking local persona..."):
-                    resp = crew.chat_as_culture_with_verbosity(culture, "local expert", followup, username, verbosity=st.session_state.get("last_summary_verbosity","medium"))
+                    resp = crew.answer_followup(culture, followup, chat_owner, verbosity=st.session_state.get("last_summary_verbosity","medium"))
                     st.session_state["last_followup"] = resp
 
 
@@ -369,26 +361,15 @@ with tab1:
             st.write(last.get("summary", ""))
             st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
 
-        # Section display logic
-        sections = st.session_state.get("last_summary_sections", [])
-        if st.session_state.get("last_summary_verbosity") == "custom" and sections:
-            if "Etiquette" in sections and last.get("etiquette"):
-                st.subheader("🤝 Etiquette")
-                st.write(last.get("etiquette", ""))
-                st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
-            if "Communication Style" in sections and last.get("communication_style"):
-                st.subheader("💬 Communication Style")
-                st.write(last.get("communication_style", ""))
-                st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
-        else:
-            if last.get("etiquette"):
-                st.subheader("🤝 Etiquette")
-                st.write(last.get("etiquette", ""))
-                st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
-            if last.get("communication_style"):
-                st.subheader("💬 Communication Style")
-                st.write(last.get("communication_style", ""))
-                st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
+        # Custom summaries only generate the selected sections; the others are fetched on request
+        if last.get("etiquette"):
+            st.subheader("🤝 Etiquette")
+            st.write(last.get("etiquette", ""))
+            st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
+        if last.get("communication_style"):
+            st.subheader("💬 Communication Style")
+            st.write(last.get("communication_style", ""))
+            st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
 
         # Show personalized recommendations if present
         if last.get("recommendations"):
@@ -396,6 +377,17 @@ with tab1:
             st.markdown(last.get("recommendations"))
             st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
 
+        section_error = st.session_state.pop("section_error", None)
+        if section_error:
+            st.warning(section_error)
+        missing = [label for label, field in SECTION_LABELS.items() if field in last.get("missing", [])]
+        if missing:
+            st.caption("Not included in this summary:")
+            cols = st.columns(len(missing))
+            for i, label in enumerate(missing):
+                cols[i].button(f"Add {label}", key=f"add_section_{label}", on_click=_add_summary_section,
+                               args=(label,))
+
         # Collapsible examples (if present)
         if last.get("examples"):
             with st.expander("Show Example(s)"):
@@ -409,7 +401,7 @@ with tab1:
             if country:
                 with st.spinner("Finding relevant resources..."):
                     try:
-                        resources = crew.get_related_resources(country)
+                        resources = cached_related_resources(country)
                     except Exception:
                         resources = []
                 if resources:
@@ -421,29 +413,19 @@ with tab1:
                 st.info("Generate a summary to see related resources.")
             st.markdown('<hr style="border:none;border-top:2px solid #e0e7ef;margin:32px 0 24px 0;">', unsafe_allow_html=True)
 
-        # Continuation controls inline
-        if _looks_cutoff(last.get("summary", "")):
-            if st.button("Continue Summary", key=f"cont_summary_{last_culture}"):
-                cont = continue_text(last.get("summary", ""))
-                if cont:
-                    last["summary"] = merge_texts(last.get("summary", ""), cont)
-                    st.session_state["last_summary"] = last
-
         # Export/Copy/Share actions
         st.write("**Actions**")
         st.write(f"**Culture:** {last_culture}")
         st.write(f"**Verbosity:** {st.session_state.get('last_summary_verbosity','')}")
 
-        summary_text = (
-            f"Culture: {last_culture}\n\n"
-            f"Summary:\n{last.get('summary', '')}\n\n"
-            f"Etiquette:\n{last.get('etiquette', '')}\n\n"
-            f"Communication Style:\n{last.get('communication_style', '')}\n"
+        summary_text = f"Culture: {last_culture}\n\n" + "\n".join(
+            f"{label}:\n{last.get(field)}\n"
+            for label, field in SECTION_LABELS.items()
+            if last.get(field) and field != "recommendations"
         )
 
         if PDF_SUPPORTED:
-            pdf_bytes = make_pdf_bytes(f"Cultural Summary - {last_culture}", summary_text)
-            st.download_button("Download PDF", pdf_bytes, file_name=sanitize_filename(f"{last_culture}_summary.pdf"), mime="application/pdf", key=f"dl_pdf_card_{last_culture}")
+            pdf_download_button("Download PDF", f"Cultural Summary - {last_culture}", summary_text, f"{last_culture}_summary.pdf", key=f"dl_pdf_card_{last_culture}")
 
         # Share link (placeholder)
         st.button("Share Link (Coming Soon)", key="share_link_btn", disabled=True)
@@ -469,12 +451,34 @@ with tab2:
     chat_verbosity = st.selectbox("Reply verbosity", ["concise", "medium", "detailed"], index=1)
     username = "user123"
 
+    if culture.strip() and persona.strip():
+        conversation = crew.get_conversation(chat_owner, culture, persona)
+        if conversation["turns"] or conversation["summary"]:
+            with st.expander(f"Conversation so far ({len(conversation['turns'])} recent messages)"):
+                if conversation["summary"]:
+                    st.caption("Earlier in this conversation:")
+                    st.markdown(conversation["summary"])
+                for turn in conversation["turns"]:
+                    st.markdown(f"**You:** {turn['user']}")
+                    st.markdown(f"**{persona}:** {turn['reply']}")
+            st.button("New conversation", key="chat_new_conversation", on_click=_new_conversation,
+                      args=(chat_owner, culture, persona))
+
+    chat_stream_area = st.empty()
     if st.button("Chat"):
         if not (culture.strip() and persona.strip() and user_text.strip()):
             st.error("Fill all fields.")
         else:
-            with st.spinner("Generating response..."):
-                result = crew.chat_as_culture_with_verbosity(culture, persona, user_text, username, verbosity=chat_verbosity)
+            chat_stream_area.info("Generating response...")
+            streamed, result = "", None
+            for event in crew.stream_chat_as_culture(culture, persona, user_text, chat_owner, verbosity=chat_verbosity):
+                if event["event"] == "delta":
+                    streamed += event["text"]
+                    chat_stream_area.markdown(streamed)
+                elif event["event"] == "done":
+                    result = event["result"]
+            chat_stream_area.empty()
+            if result is not None:
                 # save result to session so UI stays stable on download
                 st.session_state["last_chat"] = result
                 st.session_state["last_chat_meta"] = {"culture": culture, "persona": persona, "user_text": user_text}
@@ -488,44 +492,40 @@ with tab2:
         st.subheader("Persona Response")
         st.write(last.get("response", ""))
 
-        if _looks_cutoff(last.get("response", "")):
-            if st.button("Continue Response", key=f"cont_resp_{meta['culture']}_{meta['persona']}"):
-                cont = continue_text(last.get("response", ""))
-                if cont:
-                    last["response"] = merge_texts(last.get("response", ""), cont)
-                    st.session_state["last_chat"] = last
-
         st.subheader("Etiquette Feedback")
         st.write(last.get("feedback", ""))
 
-        if _looks_cutoff(last.get("feedback", "")):
-            if st.button("Continue Feedback", key=f"cont_feed_{meta['culture']}_{meta['persona']}"):
-                cont = continue_text(last.get("feedback", ""))
-                if cont:
-                    last["feedback"] = merge_texts(last.get("feedback", ""), cont)
-                    st.session_state["last_chat"] = last
-
         transcript_text = (
             f"Culture: {meta['culture']}\nPersona: {meta['persona']}\n\nUser:\n{meta['user_text']}\n\nResponse:\n{last.get('response','')}\n\nFeedback:\n{last.get('feedback','')}\n"
         )
         if PDF_SUPPORTED:
-            pdf_bytes = make_pdf_bytes(f"Chat - {meta['culture']} - {meta['persona']}", transcript_text)
-            st.download_button("Download Chat (PDF)", pdf_bytes, file_name=sanitize_filename(f"{meta['culture']}_{meta['persona']}_chat.pdf"), mime="application/pdf", key=f"dl_chat_pdf_{meta['culture']}_{meta['persona']}")
+            pdf_download_button("Download Chat (PDF)", f"Chat - {meta['culture']} - {meta['persona']}", transcript_text, f"{meta['culture']}_{meta['persona']}_chat.pdf", key=f"dl_chat_pdf_{meta['culture']}_{meta['persona']}")
 
 with tab3:
     st.header("Saved Notes")
 
     username = "user123"
-    notes = crew.get_notes(username)
+    search_query = st.text_input("Search notes and briefings", key="notes_search",
+                                 placeholder='e.g. bowing, "remove shoes", chopstick*')
+    if search_query.strip():
+        hits = crew.search(search_query, username=username)
+        if not hits:
+            st.info("No matches.")
+        for h in hits:
+            st.markdown(f"**{h['title']}** · {h['culture']} · {h['created_at']}")
+            st.markdown(h["snippet"])
+        st.markdown("---")
+
+    # show notes a page at a time; "Load more" follows the cursor and appends the next page.
+    # Saving a note changes the version, which starts the list over from the first page.
+    notes_version = crew.notes_version(username)
+    if st.session_state.get("notes_loaded_version", ()) != notes_version:
+        _load_notes(username, notes_version)
+    notes = st.session_state["notes_loaded"]
 
     if not notes:
         st.info("No notes saved yet.")
     else:
-        # button to download all notes as a single text file
-        all_text = []
-        for n in notes:
-            all_text.append(f"Title: {n['title']}\nCulture: {n['culture']}\nSaved: {n['created_at']}\n\n{n['content']}\n\n---\n\n")
-        combined = "".join(all_text)
         for n in notes:
             st.subheader(n["title"])
             st.write(f"**Culture:** {n['culture']}")
@@ -533,9 +533,16 @@ with tab3:
             st.caption(f"Saved on: {n['created_at']}")
             # per-note download
             note_text = f"Title: {n['title']}\nCulture: {n['culture']}\nSaved: {n['created_at']}\n\n{n['content']}"
-            st.download_button("Download Note", note_text, file_name=sanitize_filename(f"note_{n['created_at']}.txt"), mime="text/plain")
+            st.download_button("Download Note", note_text, file_name=sanitize_filename(f"note_{n['created_at']}.txt"), mime="text/plain", key=f"dl_note_{n['id']}")
+        if st.session_state.get("notes_cursor"):
+            st.button("Load more notes", key="notes_load_more", on_click=_load_notes,
+                      args=(username, notes_version, st.session_state["notes_cursor"]))
+        # button to download all notes as a single text file, rebuilt only after a new note is saved
+        combined = cached_notes_text(username, notes_version)
         # download all notes button (placed after notes to avoid streamlit re-run ordering issues)
         st.download_button("Download All Notes (TXT)", combined, file_name=sanitize_filename("saved_notes.txt"), mime="text/plain", key="dl_all_notes")
+        if PDF_SUPPORTED:
+            pdf_download_button("Download All Notes (PDF)", "Saved Notes", combined, "saved_notes.pdf", key="dl_all_notes_pdf")
 
     # close main content container
     st.markdown('</div>', unsafe_allow_html=True)
@@ -1,107 +1,125 @@
-from crewai import Agent, Crew
-
-# Define CrewAI agents for each function
-summary_agent = Agent(
-    role="Summary Agent",
-    goal="Generate a practical, actionable cultural summary for a given culture.",
-    backstory="Expert in cross-cultural communication and travel guidance.",
-    tools=[],
-    verbose=True
-)
+import os
+import json
+import contextvars
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from dotenv import load_dotenv
+from app.backends import BackendResponse, get_backend, is_truncated
+from app.cache import briefing_cache_key, get_briefing_cache, get_response_cache
+from app.cultures import culture_key
+from app.conversations import HISTORY_TOKEN_BUDGET, SUMMARY_TOKEN_LIMIT
+from app.feedback_jobs import get_feedback_jobs
+from app.limiter import get_limiter
+from app.metrics import FEEDBACK_CACHE_REQUESTS, track_call
+from app.similarity import NearDuplicateIndex, normalize_text
+from app.utils import merge_texts
 
-etiquette_agent = Agent(
-    role="Etiquette Agent",
-    goal="Provide etiquette rules and tips for interacting with people from a given culture.",
-    backstory="Specialist in global etiquette and social norms.",
-    tools=[],
-    verbose=True
-)
+load_dotenv()
 
-comm_agent = Agent(
-    role="Communication Agent",
-    goal="Describe communication preferences and styles for a given culture.",
-    backstory="Expert in international communication styles.",
-    tools=[],
-    verbose=True
-)
+# All model calls go through the pluggable backend ($LLM_BACKEND=gemini|offline);
+# importing this module never touches the API.
 
-recommendation_agent = Agent(
-    role="Recommendation Agent",
-    goal="Generate must-know tips and common mistakes for visitors to a given culture.",
-    backstory="Travel advisor focused on practical advice.",
-    tools=[],
-    verbose=True
-)
 
-# CrewAI orchestration (preserves previous logic)
-def crewai_generate_culture_summary(culture: str, verbosity: str = "medium", sections=None):
-    # Define tasks for each agent
-    summary_task = Task(
-        description=f"Generate a cultural summary for {culture} with verbosity {verbosity}.",
-        agent=summary_agent
-    )
-    etiquette_task = Task(
-        description=f"Provide etiquette rules for {culture}.",
-        agent=etiquette_agent
-    )
-    comm_task = Task(
-        description=f"Describe communication style for {culture}.",
-        agent=comm_agent
-    )
-    recommendation_task = Task(
-        description=f"List must-know tips and common mistakes for {culture}.",
-        agent=recommendation_agent
-    )
+def warm_up_model() -> None:
+    """Resolve the model on a background thread so callers don't block on it at startup."""
+
+    def _warm():
+        try:
+            get_backend().warm_up()
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+
+    threading.Thread(target=_warm, name="model-warm-up", daemon=True).start()
+
+
+def get_model_name() -> str:
+    """Name of the backend's model (used to key caches)."""
+    return get_backend().model_name
+
+
+# Upper bound on concurrent Gemini calls issued on behalf of a single request.
+MAX_CALLS_IN_FLIGHT = max(1, int(os.getenv("GEMINI_MAX_CALLS_IN_FLIGHT", "5")))
+
+# Per-request semaphore shared by every call made while serving that request.
+_request_slots = contextvars.ContextVar("_request_slots", default=None)
+
+
+def _model_slot():
+    """The limiter slot a model call holds; backends without a quota (offline) don't need one."""
+    return get_limiter().slot() if get_backend().rate_limited else nullcontext()
+
+
+def reserve_calls(calls: int):
+    """Reserve `calls` model calls on the limiter up front; nothing to reserve for unmetered backends."""
+    return get_limiter().reserve(calls if get_backend().rate_limited else 0)
+
+
+def _generate(prompt: str, kind: str, **kwargs):
+    """Call the model, holding one of the current request's in-flight slots if any.
+
+    `kind` labels the call in the latency/error metrics (summary, etiquette, persona, ...).
+    """
+    slots = _request_slots.get()
+    if slots is None:
+        with _model_slot(), track_call(kind):
+            return get_backend().generate(prompt, **kwargs)
+    with slots, _model_slot(), track_call(kind):
+        return get_backend().generate(prompt, **kwargs)
+
 
-    crew = Crew(
-        agents=[summary_agent, etiquette_agent, comm_agent, recommendation_agent],
-        tasks=[summary_task, etiquette_task, comm_task, recommendation_task],
-        verbose=True
+# Follow-up calls allowed when a response stops at the output-token limit.
+MAX_CONTINUATIONS = max(0, int(os.getenv("AUTO_CONTINUE_MAX_STEPS", "2")))
+
+
+def _continuation_prompt(existing_text: str) -> str:
+    # Include a short context window (last 400 chars) to keep prompt concise.
+    context = existing_text.strip()[-400:]
+    return (
+        "Finish the last incomplete sentence from the text below and then add 1-2 concise sentences to complete the thought. "
+        "Do NOT repeat any of the existing words or sentences — return ONLY the new continuation text (no quotes, no extra commentary). "
+        "Keep the continuation short and directly connected to the previous content.\n\n"
+        f"TEXT CONTEXT:\n{context}"
     )
-    results = crew.kickoff()
-    # Map CrewAI results to previous output format
-    return {
-        "summary": results[0],
-        "etiquette": results[1],
-        "communication_style": results[2],
-        "recommendations": results[3],
-        "sections": sections
-    }
 
-# Preserve previous API: allow switching between CrewAI and legacy logic
-def generate_culture_summary(culture: str, verbosity: str = "medium", sections=None, use_crew=False) -> dict:
-    if use_crew:
-        return crewai_generate_culture_summary(culture, verbosity=verbosity, sections=sections)
-    else:
-        return _wrap_generate_culture_summary(culture, verbosity=verbosity, sections=sections)
-import os
-import json
-from dotenv import load_dotenv
 
-load_dotenv()
+def _continue_truncated(text: str, response, max_output_tokens: int = None) -> str:
+    """Continue `text` while the model reports it was cut off, at most MAX_CONTINUATIONS times."""
+    for _ in range(MAX_CONTINUATIONS):
+        if not is_truncated(response, max_output_tokens):
+            break
+        response = _generate(_continuation_prompt(text), "continue")
+        text = merge_texts(text, response.text)
+    return text
 
-# Configure Gemini API directly
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Initialize API and model
-import google.generativeai as genai
-genai.configure(api_key=GEMINI_API_KEY)
+def _generate_text(prompt: str, kind: str, **kwargs) -> str:
+    """`_generate(...).text`, continued automatically when the model stops at its output-token limit."""
+    response = _generate(prompt, kind, **kwargs)
+    limit = (kwargs.get("generation_config") or {}).get("max_output_tokens")
+    return _continue_truncated(response.text, response, limit)
 
-# Try models in order of preference
-model = None
-models_to_try = ["gemini-2.0-flash", "gemini-1.5-flash", "gemini-pro", "gemini-1.5-pro"]
 
-for model_name in models_to_try:
-    try:
-        model = genai.GenerativeModel(model_name)
-        print(f"Using model: {model_name}")
-        break
-    except Exception as e:
-        print(f"Model {model_name} not available: {e}")
-        continue
+def _fan_out(calls, return_exceptions: bool = False) -> list:
+    """Run independent zero-argument callables concurrently and return their results in order.
 
-if model is None:
-    raise Exception("No available models found. Check your API key.")
+    Like `asyncio.gather`: the first exception is re-raised unless `return_exceptions`
+    is set, in which case exceptions are returned in place of results.
+    """
+    if not calls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        # copy the context per call so worker threads see the request's slots
+        futures = [pool.submit(contextvars.copy_context().run, fn) for fn in calls]
+    results = []
+    for fut in futures:
+        exc = fut.exception()
+        if exc is not None and not return_exceptions:
+            raise exc
+        results.append(exc if exc is not None else fut.result())
+    return results
 
 
 def cultural_summary_prompt(culture: str) -> str:
@@ -121,8 +139,14 @@ Suggested section headings (use those or equally clear equivalents):
 Total length: aim for 350–600 words. For each section give specific, actionable guidance (what to do, what to avoid, and why). Prefer examples and short phrases the user can follow. No long historical essays — focus on practical behavior and short explanations."""
 
 
-def persona_chat_prompt(culture: str, persona: str, text: str) -> str:
-    return f"""You are {persona} from {culture}. Respond succinctly to this message: "{text}"
+def persona_chat_prompt(culture: str, persona: str, text: str, history: str = "") -> str:
+    if history:
+        history = f"""This is an ongoing conversation. Stay consistent with it and don't repeat yourself.
+
+{history}
+
+"""
+    return f"""You are {persona} from {culture}. {history}Respond succinctly to this message: "{text}"
 
 Reply in character using cultural phrasing, but keep your reply to 1–3 short sentences (or 2–3 short bullet points).
 Be friendly and clear; avoid long paragraphs."""
@@ -142,48 +166,145 @@ Provide constructive feedback on:
 Be constructive and helpful, not judgmental. Keep feedback to 3 short points or under ~150 words."""
 
 
-def generate_culture_summary(culture: str, verbosity: str = "medium", sections=None) -> dict:
+# Generation modes selectable on generate_culture_summary. "legacy" issues one prompt per
+# section; "json" asks for every section at once as a single JSON object; "crew" runs
+# one CrewAI agent per section (crewai is only imported in that mode).
+BRIEFING_MODES = ("legacy", "json", "crew")
+DEFAULT_BRIEFING_MODE = os.getenv("BRIEFING_MODE", "legacy")
+
+
+def generate_culture_summary(culture: str, verbosity: str = "medium", sections=None, mode: str = None) -> dict:
     """Generate a cultural summary using Gemini API.
 
     Accepts an optional `verbosity` argument (concise|medium|detailed) and `sections`.
+    `mode` selects the generation strategy (legacy|json|crew); defaults to $BRIEFING_MODE.
     """
+    mode = (mode or DEFAULT_BRIEFING_MODE).strip().lower()
+    if mode not in BRIEFING_MODES:
+        raise ValueError(f"Unknown briefing mode {mode!r}; expected one of {', '.join(BRIEFING_MODES)}")
+    if mode == "json":
+        return _wrap_structured_culture_summary(culture, verbosity=verbosity, sections=sections)
+    if mode == "crew":
+        return crewai_generate_culture_summary(culture, verbosity=verbosity, sections=sections)
     return _wrap_generate_culture_summary(culture, verbosity=verbosity, sections=sections)
 
+def cached_culture_summary(culture: str, verbosity: str = "medium", sections=None, mode: str = None):
+    """Return the summary dict if it can be served entirely from the briefing cache, else None.
+
+    Never calls the model, so batch callers can answer cache hits immediately.
+    """
+    mode = (mode or DEFAULT_BRIEFING_MODE).strip().lower()
+    key_culture = culture.strip().lower()
+    cache = get_briefing_cache()
+    if mode == "json":
+        prompt = structured_briefing_prompt(key_culture, verbosity)
+        cached = cache.get(briefing_cache_key(key_culture, verbosity, "json", prompt, get_model_name()))
+        if cached is None:
+            return None
+        summary, etiquette, comm, tips, mistakes = cached
+        results = {"summary": summary, "etiquette": etiquette, "communication_style": comm,
+                   "tips": tips, "mistakes": mistakes}
+        return _assemble_summary(results, sections)
+
+    verbosity = _prompt_verbosity(verbosity)
+    if mode == "crew":
+        keys = _crew_cache_keys(key_culture, verbosity)
+    else:
+        jobs = _section_jobs(key_culture, verbosity)
+        keys = {name: briefing_cache_key(key_culture, verbosity, name, jobs[name][0], get_model_name())
+                for name in jobs}
+    results = {}
+    for name in plan_sections(sections):
+        cached = cache.get(keys[name])
+        if cached is None:
+            return None
+        results[name] = cached
+    return _assemble_summary(results, sections)
+
+
 def _wrap_generate_culture_summary(culture: str, verbosity: str = "medium", sections=None):
     # This function wraps the raw summary and formats the output.
-    # The sections argument is accepted for future use (custom summaries).
-    raw_summary, raw_etique, raw_comm = _raw_generate_culture_summary(culture.strip().lower(), verbosity)
+    # Only the sections asked for are generated (see plan_sections); the planned
+    # sections are independent, so the uncached ones are issued together and at
+    # most MAX_CALLS_IN_FLIGHT model calls run at once.
+    token = _request_slots.set(threading.BoundedSemaphore(MAX_CALLS_IN_FLIGHT))
+    try:
+        results = _generate_sections(culture.strip().lower(), _prompt_verbosity(verbosity), plan_sections(sections))
+    finally:
+        _request_slots.reset(token)
+    return _assemble_summary(results, sections)
+
+
+def _assemble_summary(results: dict, sections=None) -> dict:
+    """Build the public summary dict from {section: text or Exception} results.
 
-    # Generate personalized recommendations (must-know tips and common mistakes)
+    Sections that weren't generated are None and listed under "missing", so callers
+    can fill them later with `generate_summary_section`.
+    """
+    for name in ("summary", "etiquette", "communication_style"):
+        if isinstance(results.get(name), Exception):
+            raise results[name]
+
+    # Personalized recommendations (must-know tips and common mistakes) are best-effort
+    tips, mistakes = results.get("tips"), results.get("mistakes")
+    if tips is None or mistakes is None:
+        recommendations = None
+    elif isinstance(tips, Exception) or isinstance(mistakes, Exception):
+        recommendations = ""
+    else:
+        recommendations = _format_recommendations(tips, mistakes)
+
+    summary = {
+        "summary": results.get("summary"),
+        "etiquette": results.get("etiquette"),
+        "communication_style": results.get("communication_style"),
+        "recommendations": recommendations,
+        "sections": sections,
+    }
+    summary["missing"] = [name for name in SECTION_FIELDS if summary[name] is None]
+    return summary
+
+
+def _wrap_structured_culture_summary(culture: str, verbosity: str = "medium", sections=None):
+    # Same output shape as the legacy path, built from one structured call.
+    token = _request_slots.set(threading.BoundedSemaphore(MAX_CALLS_IN_FLIGHT))
     try:
-        tips_prompt = (
-            f"List 2–3 must-know tips for visitors to {culture}. Use short, actionable bullet points."
+        raw_summary, raw_etique, raw_comm, tips, mistakes = _raw_structured_culture_summary(
+            culture.strip().lower(), verbosity
         )
-        mistakes_prompt = (
-            f"List 2 common mistakes to avoid when interacting with locals in {culture}. Use short, actionable bullet points."
-        )
-        tips_response = model.generate_content(tips_prompt)
-        mistakes_response = model.generate_content(mistakes_prompt)
-        recommendations = "\n**Personalized Recommendations**\n" + \
-            "\nMust-Know Tips:\n" + tips_response.text.strip() + \
-            "\nCommon Mistakes to Avoid:\n" + mistakes_response.text.strip()
-    except Exception:
-        recommendations = ""
+    finally:
+        _request_slots.reset(token)
 
     return {
         "summary": raw_summary,
         "etiquette": raw_etique,
         "communication_style": raw_comm,
-        "recommendations": recommendations,
-        "sections": sections  # Pass through for future use
+        "recommendations": _format_recommendations(tips, mistakes) if tips and mistakes else "",
+        "sections": sections,
+        # one structured call produces every section, so nothing is left to fill in
+        "missing": [],
     }
 
-from functools import lru_cache
+
+def _format_recommendations(tips: str, mistakes: str) -> str:
+    return "\n**Personalized Recommendations**\n" + \
+        "\nMust-Know Tips:\n" + tips.strip() + \
+        "\nCommon Mistakes to Avoid:\n" + mistakes.strip()
+
+
+def _recommendation_prompts(culture: str):
+    """Return the (tips, mistakes) prompts for the personalized recommendations."""
+    tips_prompt = (
+        f"List 2–3 must-know tips for visitors to {culture}. Use short, actionable bullet points."
+    )
+    mistakes_prompt = (
+        f"List 2 common mistakes to avoid when interacting with locals in {culture}. Use short, actionable bullet points."
+    )
+    return tips_prompt, mistakes_prompt
 
 
-@lru_cache(maxsize=128)
-def _raw_generate_culture_summary(culture: str, verbosity: str = "medium"):
-    """Internal cached call that returns raw strings (not truncated)."""
+def _summary_prompts(culture: str, verbosity: str = "medium"):
+    """Return the (summary, etiquette, communication) prompts for a verbosity level."""
     # Build distinctly different prompts per verbosity so outputs are noticeably different.
     if verbosity == "concise":
         # Very short, skimmable briefing
@@ -224,80 +345,728 @@ def _raw_generate_culture_summary(culture: str, verbosity: str = "medium"):
         comm_prompt = (
             f"Describe communication preferences in {culture} with 3 short points (tone, directness, formality) and one short example each."
         )
+    return prompt, etiquette_prompt, comm_prompt
 
-    response = model.generate_content(prompt)
-    etiquette_response = model.generate_content(etiquette_prompt)
-    comm_response = model.generate_content(comm_prompt)
 
-    raw_et = etiquette_response.text
+def _count_points(text: str) -> int:
+    # Count lines that look like list items or numbered points
+    if not text:
+        return 0
+    count = 0
+    lines = text.splitlines()
+    for l in lines:
+        l = l.strip()
+        if not l:
+            continue
+        if l[0].isdigit() and (l[1:2] == '.' or l[1:2] == ')'):
+            count += 1
+        elif l.startswith(('-', '*', '•')):
+            count += 1
+    # fallback: if there are multiple short sentences, approximate
+    if count == 0:
+        # count sentences as proxy
+        count = max(0, min(10, text.count('.') + text.count('!') + text.count('?')))
+    return count
 
 
-    def _count_points(text: str) -> int:
-        # Count lines that look like list items or numbered points
-        if not text:
-            return 0
-        count = 0
-        lines = text.splitlines()
-        for l in lines:
-            l = l.strip()
-            if not l:
-                continue
-            if l[0].isdigit() and (l[1:2] == '.' or l[1:2] == ')'):
-                count += 1
-            elif l.startswith(('-', '*', '•')):
-                count += 1
-        # fallback: if there are multiple short sentences, approximate
-        if count == 0:
-            # count sentences as proxy
-            count = max(0, min(10, text.count('.') + text.count('!') + text.count('?')))
-        return count
-
-    # If detailed verbosity requested, ensure etiquette has at least 5 points
-    if verbosity == "detailed":
+def _top_up_etiquette(culture: str, raw_et: str, verbosity: str) -> str:
+    """For detailed verbosity, ask for more etiquette points until there are at least 5."""
+    if verbosity != "detailed":
+        return raw_et
+    try:
+        need = 5 - _count_points(raw_et)
+        if need > 0:
+            add_prompt = (
+                f"You previously listed some etiquette points for {culture}."
+                f" Please provide {need} additional, distinct etiquette points (one per line), numbered,"
+                " and do not repeat the earlier points. Keep each point to one sentence."
+            )
+            add_text = _generate_text(add_prompt, "top-up")
+            # append the new points
+            raw_et = (raw_et.rstrip() + "\n" + add_text).strip()
+    except Exception:
+        # best-effort, ignore failures
+        pass
+    return raw_et
+
+# Sections produced by the legacy path, one prompt each.
+SUMMARY_SECTIONS = ("summary", "etiquette", "communication_style", "tips", "mistakes")
+
+# Metric label for the model call behind each section.
+SECTION_CALL_KINDS = {"summary": "summary", "etiquette": "etiquette", "communication_style": "comm",
+                      "tips": "tips", "mistakes": "mistakes"}
+
+
+# Fields of the summary dict, and the sections each is generated from.
+SECTION_FIELDS = {
+    "summary": ("summary",),
+    "etiquette": ("etiquette",),
+    "communication_style": ("communication_style",),
+    "recommendations": ("tips", "mistakes"),
+}
+
+# UI labels (the custom-mode checkboxes in app.py) for each field.
+SECTION_LABELS = {
+    "Summary": "summary",
+    "Etiquette": "etiquette",
+    "Communication Style": "communication_style",
+    "Recommendations": "recommendations",
+}
+
+
+def _section_field(name: str) -> str:
+    field = SECTION_LABELS.get(name, name.strip().lower().replace(" ", "_"))
+    if field not in SECTION_FIELDS:
+        raise ValueError(f"Unknown summary section {name!r}; expected one of {', '.join(SECTION_LABELS)}")
+    return field
+
+
+def plan_sections(sections=None) -> tuple:
+    """Sections to generate for the requested fields or labels; None means all of them.
+
+    Only these prompts are issued, so a custom summary with just "Etiquette" costs
+    one model call instead of five.
+    """
+    if sections is None:
+        return SUMMARY_SECTIONS
+    wanted = {part for name in sections for part in SECTION_FIELDS[_section_field(name)]}
+    return tuple(name for name in SUMMARY_SECTIONS if name in wanted)
+
+
+def planned_calls(sections=None, mode: str = None) -> int:
+    """Model calls a summary of `sections` normally costs in `mode` (continuations aside)."""
+    if (mode or DEFAULT_BRIEFING_MODE).strip().lower() == "json":
+        return 1
+    return len(plan_sections(sections))
+
+
+def _prompt_verbosity(verbosity: str) -> str:
+    # "custom" picks sections, not length; it uses the medium prompts and shares their cache entries
+    return "medium" if verbosity == "custom" else verbosity
+
+
+def generate_summary_section(culture: str, section: str, verbosity: str = "medium") -> str:
+    """Generate (or fetch from cache) one field of a summary on demand, e.g. when the user expands it."""
+    field = _section_field(section)
+    token = _request_slots.set(threading.BoundedSemaphore(MAX_CALLS_IN_FLIGHT))
+    try:
+        results = _generate_sections(culture.strip().lower(), _prompt_verbosity(verbosity), SECTION_FIELDS[field])
+    finally:
+        _request_slots.reset(token)
+    return _assemble_summary(results)[field]
+
+
+def _section_jobs(culture: str, verbosity: str = "medium") -> dict:
+    """Map each section to its (prompt, producer) pair; producers return the section text."""
+    prompt, etiquette_prompt, comm_prompt = _summary_prompts(culture, verbosity)
+    tips_prompt, mistakes_prompt = _recommendation_prompts(culture)
+    return {
+        "summary": (prompt, lambda: _generate_text(prompt, "summary")),
+        # If detailed verbosity requested, ensure etiquette has at least 5 points
+        "etiquette": (etiquette_prompt,
+                      lambda: _top_up_etiquette(culture, _generate_text(etiquette_prompt, "etiquette"), verbosity)),
+        "communication_style": (comm_prompt, lambda: _generate_text(comm_prompt, "comm")),
+        "tips": (tips_prompt, lambda: _generate_text(tips_prompt, "tips")),
+        "mistakes": (mistakes_prompt, lambda: _generate_text(mistakes_prompt, "mistakes")),
+    }
+
+
+def _generate_sections(culture: str, verbosity: str, names) -> dict:
+    """Return {section: text or Exception} for `names`, serving hits from the briefing cache.
+
+    Misses are generated concurrently and written back on success, so every section
+    (including tips and mistakes) is generated once per TTL across all processes.
+    """
+    cache = get_briefing_cache()
+    jobs = _section_jobs(culture, verbosity)
+    results, misses = {}, []
+    for name in names:
+        key = briefing_cache_key(culture, verbosity, name, jobs[name][0], get_model_name())
+        cached = cache.get(key)
+        if cached is not None:
+            results[name] = cached
+        else:
+            misses.append((name, key))
+
+    outputs = _fan_out([jobs[name][1] for name, _ in misses], return_exceptions=True)
+    for (name, key), out in zip(misses, outputs):
+        if not isinstance(out, Exception):
+            cache.set(key, out)
+        results[name] = out
+    return results
+
+
+# CrewAI orchestration. Each section is a task for its own single-agent crew, so the
+# agents run concurrently rather than one after another in a sequential crew, and each
+# task's output is read from the task itself rather than by position in the crew result.
+CREWAI_LLM = os.getenv("CREWAI_LLM", "gemini/gemini-2.0-flash")
+CREWAI_VERBOSE = os.getenv("CREWAI_VERBOSE", "0").strip().lower() in ("1", "true", "yes")
+
+# The agent (see CREW_AGENTS) that handles each section.
+CREW_SECTION_AGENTS = {"summary": "summary", "etiquette": "etiquette", "communication_style": "comm",
+                       "tips": "recommendation", "mistakes": "recommendation"}
+
+# Role, goal and backstory of each CrewAI agent.
+CREW_AGENTS = {
+    "summary": ("Summary Agent",
+                "Generate a practical, actionable cultural summary for a given culture.",
+                "Expert in cross-cultural communication and travel guidance."),
+    "etiquette": ("Etiquette Agent",
+                  "Provide etiquette rules and tips for interacting with people from a given culture.",
+                  "Specialist in global etiquette and social norms."),
+    "comm": ("Communication Agent",
+             "Describe communication preferences and styles for a given culture.",
+             "Expert in international communication styles."),
+    "recommendation": ("Recommendation Agent",
+                       "Generate must-know tips and common mistakes for visitors to a given culture.",
+                       "Travel advisor focused on practical advice."),
+}
+
+
+@lru_cache(maxsize=1)
+def _crew_llm():
+    """The LLM client shared by every crew; crewai is only imported in crew mode."""
+    from crewai import LLM
+
+    return LLM(model=CREWAI_LLM)
+
+
+def _new_crew_agent(kind: str):
+    # A crew's kickoff binds its agents (agent.crew, the executor), so concurrently
+    # running crews must not share Agent instances; each gets a fresh one.
+    from crewai import Agent
+
+    role, goal, backstory = CREW_AGENTS[kind]
+    return Agent(role=role, goal=goal, backstory=backstory, tools=[], llm=_crew_llm(), verbose=CREWAI_VERBOSE)
+
+
+def _crew_task_descriptions(culture: str, verbosity: str = "medium") -> dict:
+    # Agents get the legacy prompts so every mode produces the same section formats.
+    return dict(zip(SUMMARY_SECTIONS, _summary_prompts(culture, verbosity) + _recommendation_prompts(culture)))
+
+
+def _crew_cache_keys(culture: str, verbosity: str) -> dict:
+    descriptions = _crew_task_descriptions(culture, verbosity)
+    return {name: briefing_cache_key(culture, verbosity, f"crew-{name}", descriptions[name], CREWAI_LLM)
+            for name in descriptions}
+
+
+def _kickoff_section(name: str, description: str) -> str:
+    """Run one section's task in its own crew and return that task's output."""
+    from crewai import Crew, Task
+
+    task = Task(
+        description=description,
+        expected_output=f"The {name.replace('_', ' ')} section as plain text, following the format requested.",
+        agent=_new_crew_agent(CREW_SECTION_AGENTS[name]),
+    )
+    crew = Crew(agents=[task.agent], tasks=[task], verbose=CREWAI_VERBOSE)
+    with get_limiter().slot(), track_call(f"crew-{SECTION_CALL_KINDS[name]}"):
+        result = crew.kickoff()
+    output = task.output if task.output is not None else result
+    return str(getattr(output, "raw", output)).strip()
+
+
+def crewai_generate_culture_summary(culture: str, verbosity: str = "medium", sections=None):
+    """Generate the planned sections with CrewAI agents, concurrently.
+
+    Each agent's output is cached on its own (per culture, verbosity and section),
+    so a retry or a request for other sections only runs the agents still missing.
+    """
+    key_culture = culture.strip().lower()
+    verbosity = _prompt_verbosity(verbosity)
+    cache = get_briefing_cache()
+    descriptions = _crew_task_descriptions(key_culture, verbosity)
+    keys = _crew_cache_keys(key_culture, verbosity)
+
+    results, misses = {}, []
+    for name in plan_sections(sections):
+        cached = cache.get(keys[name])
+        if cached is not None:
+            results[name] = cached
+        else:
+            misses.append(name)
+
+    outputs = _fan_out([lambda n=n: _kickoff_section(n, descriptions[n]) for n in misses], return_exceptions=True)
+    for name, out in zip(misses, outputs):
+        if not isinstance(out, Exception):
+            if name == "etiquette":
+                out = _top_up_etiquette(key_culture, out, verbosity)
+            cache.set(keys[name], out)
+        results[name] = out
+    return _assemble_summary(results, sections)
+
+
+def _run_with_slots(slots, fn):
+    # Worker threads start with an empty context; bind the request's slots for this call.
+    token = _request_slots.set(slots)
+    try:
+        return fn()
+    finally:
+        _request_slots.reset(token)
+
+
+def _record(stream, parts: list):
+    """Re-yield `stream`'s chunks, appending each to `parts`; returns the stream's return value."""
+    while True:
         try:
-            need = 5 - _count_points(raw_et)
-            if need > 0:
-                add_prompt = (
-                    f"You previously listed some etiquette points for {culture}."
-                    f" Please provide {need} additional, distinct etiquette points (one per line), numbered,"
-                    " and do not repeat the earlier points. Keep each point to one sentence."
-                )
-                add_resp = model.generate_content(add_prompt)
-                # append the new points
-                raw_et = (raw_et.rstrip() + "\n" + add_resp.text).strip()
-        except Exception:
-            # best-effort, ignore failures
-            pass
-
-    return (response.text, raw_et, comm_response.text)
-
-
-
-def chat_with_persona(culture: str, persona: str, message: str, verbosity: str = "medium") -> dict:
-    """Chat as a cultural persona using Gemini API."""
+            chunk = next(stream)
+        except StopIteration as stop:
+            return stop.value
+        parts.append(chunk)
+        yield chunk
+
+
+def _generate_stream(prompt: str, kind: str):
+    """Yield text chunks from a streaming model call as they arrive.
+
+    If the model stops at its output-token limit the text is continued like
+    `_generate_text`; each continuation is yielded once merged, minus the text it repeats.
+    """
+    parts = []
+    with _model_slot(), track_call(kind):
+        reason = yield from _record(get_backend().generate_stream(prompt), parts)
+    text = "".join(parts)
+    response = BackendResponse(text, finish_reason=reason)
+    for _ in range(MAX_CONTINUATIONS):
+        if not is_truncated(response):
+            break
+        response = _generate(_continuation_prompt(text), "continue")
+        merged = merge_texts(text, response.text)
+        # merge_texts keeps `text` (stripped) as the prefix, so the rest is new
+        delta = merged[len(text.strip()):]
+        text = merged
+        if delta:
+            yield delta
+
+
+def stream_culture_summary(culture: str, verbosity: str = "medium", sections=None):
+    """Streaming variant of the legacy summary path.
+
+    Yields event dicts:
+      {"event": "delta", "section": "summary", "text": chunk}  summary tokens as produced
+      {"event": "section", "section": name, "text": full_text}  each section once complete
+      {"event": "done", "result": {...}}  the same dict generate_culture_summary returns
+
+    Cached sections are emitted immediately. The other sections are generated in the
+    background while the summary streams, so the first bytes arrive after one call's
+    time-to-first-token rather than after the slowest section.
+    """
+    key_culture = culture.strip().lower()
+    verbosity = _prompt_verbosity(verbosity)
+    planned = plan_sections(sections)
+    cache = get_briefing_cache()
+    jobs = _section_jobs(key_culture, verbosity)
+    keys = {name: briefing_cache_key(key_culture, verbosity, name, jobs[name][0], get_model_name())
+            for name in planned}
+    slots = threading.BoundedSemaphore(MAX_CALLS_IN_FLIGHT)
+
+    results = {}
+    for name in planned:
+        cached = cache.get(keys[name])
+        if cached is not None:
+            results[name] = cached
+            yield {"event": "section", "section": name, "text": cached}
+
+    pending = [name for name in planned if name not in results and name != "summary"]
+    with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+        futures = {pool.submit(_run_with_slots, slots, jobs[name][1]): name for name in pending}
+
+        if "summary" in planned and "summary" not in results:
+            parts = []
+            try:
+                with slots:
+                    for text in _generate_stream(jobs["summary"][0], "summary"):
+                        parts.append(text)
+                        yield {"event": "delta", "section": "summary", "text": text}
+                results["summary"] = "".join(parts)
+                cache.set(keys["summary"], results["summary"])
+                yield {"event": "section", "section": "summary", "text": results["summary"]}
+            except Exception as e:
+                results["summary"] = e
+
+        for fut in as_completed(futures):
+            name = futures[fut]
+            exc = fut.exception()
+            if exc is not None:
+                results[name] = exc
+                continue
+            results[name] = fut.result()
+            cache.set(keys[name], results[name])
+            yield {"event": "section", "section": name, "text": results[name]}
+
+    yield {"event": "done", "result": _assemble_summary(results, sections)}
+
+
+# Keys of the single JSON object requested in "json" mode, in output order.
+BRIEFING_JSON_FIELDS = ("summary", "etiquette", "communication_style", "tips", "mistakes")
+
+
+def structured_briefing_prompt(culture: str, verbosity: str = "medium") -> str:
+    """Prompt asking for every briefing section at once as one JSON object."""
+    prompt, etiquette_prompt, comm_prompt = _summary_prompts(culture, verbosity)
+    tips_prompt, mistakes_prompt = _recommendation_prompts(culture)
+    return f"""Return a single JSON object (no markdown fences, no commentary) with exactly these string keys:
+
+"summary": {prompt}
+"etiquette": {etiquette_prompt}
+"communication_style": {comm_prompt}
+"tips": {tips_prompt}
+"mistakes": {mistakes_prompt}
+
+Each value must be a non-empty string; put headings, numbered points and bullets inside the string using newlines."""
+
+
+def _parse_structured_briefing(text: str) -> dict:
+    """Parse the model's JSON briefing and return only the sections that are well formed.
+
+    Values must be non-empty strings; lists of non-empty strings are accepted and joined
+    as bullets. Anything else is dropped so the caller can regenerate that section.
+    """
+    if not text:
+        return {}
+    s = text.strip()
+    # tolerate a fenced block or stray prose around the object
+    start, end = s.find("{"), s.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(s[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    parsed = {}
+    for field in BRIEFING_JSON_FIELDS:
+        value = data.get(field)
+        if isinstance(value, list) and value and all(isinstance(v, str) and v.strip() for v in value):
+            value = "\n".join(f"- {v.strip()}" for v in value)
+        if isinstance(value, str) and value.strip():
+            parsed[field] = value.strip()
+    return parsed
+
+
+def _raw_structured_culture_summary(culture: str, verbosity: str = "medium"):
+    """Cached "json" mode call: one request for all sections, then per-section repair.
+
+    Returns (summary, etiquette, communication_style, tips, mistakes) raw strings.
+    """
+    prompt = structured_briefing_prompt(culture, verbosity)
+    cache = get_briefing_cache()
+    key = briefing_cache_key(culture, verbosity, "json", prompt, get_model_name())
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
     try:
-        # adjust prompt slightly based on verbosity
-        if verbosity == "concise":
-            prompt = persona_chat_prompt(culture, persona, message) + "\n\nReply in 1 short sentence."
-            resp_limit = 300
-        elif verbosity == "detailed":
-            prompt = persona_chat_prompt(culture, persona, message) + "\n\nYou may answer with 3-5 short sentences if helpful."
-            resp_limit = 1200
+        response = _generate(prompt, "structured", generation_config={"response_mime_type": "application/json"})
+        parsed = _parse_structured_briefing(response.text)
+    except Exception as e:
+        print(f"Structured briefing failed for {culture}: {e}")
+        parsed = {}
+
+    # Regenerate only the sections that were missing or malformed, with the legacy prompts.
+    fallback_prompts = dict(zip(BRIEFING_JSON_FIELDS,
+                                _summary_prompts(culture, verbosity) + _recommendation_prompts(culture)))
+    missing = [f for f in BRIEFING_JSON_FIELDS if f not in parsed]
+    if missing:
+        print(f"Regenerating malformed briefing sections for {culture}: {', '.join(missing)}")
+        responses = _fan_out([lambda f=f: _generate_text(fallback_prompts[f], SECTION_CALL_KINDS[f]) for f in missing],
+                             return_exceptions=True)
+        for field, resp in zip(missing, responses):
+            if isinstance(resp, Exception):
+                # core sections are required, recommendations are best-effort
+                if field in ("tips", "mistakes"):
+                    parsed[field] = ""
+                    continue
+                raise resp
+            parsed[field] = resp
+
+    parsed["etiquette"] = _top_up_etiquette(culture, parsed["etiquette"], verbosity)
+    result = tuple(parsed[f] for f in BRIEFING_JSON_FIELDS)
+    if all(result):
+        # don't pin a briefing whose recommendations failed for the whole TTL
+        cache.set(key, list(result))
+    return result
+
+
+
+def _persona_prompt(culture: str, persona: str, message: str, verbosity: str = "medium", history: str = ""):
+    """Return the persona prompt and the reply length limit for a verbosity level."""
+    # adjust prompt slightly based on verbosity
+    if verbosity == "concise":
+        prompt = persona_chat_prompt(culture, persona, message, history) + "\n\nReply in 1 short sentence."
+        resp_limit = 300
+    elif verbosity == "detailed":
+        prompt = persona_chat_prompt(culture, persona, message, history) + "\n\nYou may answer with 3-5 short sentences if helpful."
+        resp_limit = 1200
+    else:
+        prompt = persona_chat_prompt(culture, persona, message, history)
+        resp_limit = 800
+    return prompt, resp_limit
+
+
+def conversation_summary_prompt(culture: str, persona: str, summary: str, turns) -> str:
+    transcript = "\n".join(f"User: {u}\nYou: {r}" for u, r in turns)
+    earlier = f"Summary so far:\n{summary}\n\n" if summary else ""
+    return f"""You are keeping notes on a conversation between a user and {persona} from {culture}.
+{earlier}New messages:
+{transcript}
+
+Update the summary to cover everything above: what the user asked about, what they told
+you about themselves and their plans, and the advice already given. Write at most
+5 short bullet points. Return only the summary."""
+
+
+def _compact_conversation(session) -> None:
+    """Fold turns beyond the history budget into the session's rolling summary.
+
+    Best-effort: if the summary call fails, the old turns are dropped and the previous
+    summary kept, so the prompt stays within budget either way.
+    """
+    overflow = session.take_overflow(HISTORY_TOKEN_BUDGET)
+    if not overflow:
+        return
+    try:
+        prompt = conversation_summary_prompt(session.culture, session.persona, session.summary, overflow)
+        session.summary = truncate_text(_generate(prompt, "compact").text, max_chars=SUMMARY_TOKEN_LIMIT * 4)
+    except Exception as e:
+        print(f"Conversation compaction failed; dropping {len(overflow)} old turn(s): {e}")
+
+
+def chat_with_persona(culture: str, persona: str, message: str, verbosity: str = "medium", session=None,
+                      defer_feedback: bool = False) -> dict:
+    """Chat as a cultural persona using Gemini API.
+
+    The persona reply and the etiquette feedback are generated concurrently. With
+    `defer_feedback`, this returns as soon as the reply is ready, with
+    "feedback": None and a "feedback_id" to collect it from `get_feedback_jobs()`.
+
+    With a `session` (see app.conversations), the reply sees the conversation so far
+    and the turn is added to it afterwards.
+    """
+    if session is None:
+        return _chat_turn(culture, persona, message, verbosity, defer_feedback=defer_feedback)
+    with session.lock:
+        result = _chat_turn(culture, persona, message, verbosity, session.history_text(), defer_feedback)
+        session.add_turn(message, result["response"])
+        _compact_conversation(session)
+    return result
+
+
+# Reworded messages at least this similar (shingle Jaccard), with the same content
+# words, reuse an earlier analysis.
+FEEDBACK_SIMILARITY_THRESHOLD = float(os.getenv("FEEDBACK_SIMILARITY_THRESHOLD", "0.8"))
+# Near-duplicate indexes kept per process (one per culture, or culture and verbosity); LRU beyond that.
+MAX_REUSE_INDEXES = max(1, int(os.getenv("MAX_REUSE_INDEXES", "256")))
+_feedback_indexes = OrderedDict()  # canonical culture key -> NearDuplicateIndex of message -> feedback
+_feedback_indexes_lock = threading.Lock()
+
+
+def _lru_index(indexes: OrderedDict, lock, key, threshold: float) -> NearDuplicateIndex:
+    """The index stored under `key`, created on first use; evicts the least recently used past the cap."""
+    with lock:
+        index = indexes.get(key)
+        if index is None:
+            index = indexes[key] = NearDuplicateIndex(threshold=threshold)
+            while len(indexes) > MAX_REUSE_INDEXES:
+                indexes.popitem(last=False)
         else:
-            prompt = persona_chat_prompt(culture, persona, message)
-            resp_limit = 800
+            indexes.move_to_end(key)
+        return index
+
+
+def _feedback_index(culture: str) -> NearDuplicateIndex:
+    return _lru_index(_feedback_indexes, _feedback_indexes_lock, culture_key(culture),
+                      FEEDBACK_SIMILARITY_THRESHOLD)
+
 
-        response = model.generate_content(prompt)
+def _feedback(culture: str, message: str) -> str:
+    """Etiquette feedback for `message`, reusing earlier analyses where possible.
 
-        feedback_prompt = etiquette_feedback_prompt(culture, message)
-        feedback_response = model.generate_content(feedback_prompt)
+    Feedback depends only on the culture and the message, so it is cached on disk
+    under the normalized message, and an in-process near-duplicate index lets
+    trivially reworded messages ("Hello, nice to meet you!" / "hello nice to meet
+    you :)") share one analysis. Messages differing in any content word (including
+    a negation) never share one.
+    """
+    index = _feedback_index(culture)
+    near = index.lookup(message)
+    if near is not None:
+        FEEDBACK_CACHE_REQUESTS.inc(result="exact" if near[1] == 1.0 else "near")
+        return near[0]
+
+    cache = get_response_cache()
+    key = briefing_cache_key(
+        culture, "", "feedback", etiquette_feedback_prompt(culture, normalize_text(message)), get_model_name()
+    )
+    feedback = cache.get(key)
+    if feedback is not None:
+        FEEDBACK_CACHE_REQUESTS.inc(result="exact")
+    else:
+        FEEDBACK_CACHE_REQUESTS.inc(result="miss")
+        feedback = truncate_text(_generate(etiquette_feedback_prompt(culture, message), "feedback").text, max_chars=800)
+        cache.set(key, feedback)
+    index.add(message, feedback)
+    return feedback
 
+
+def _chat_turn(culture: str, persona: str, message: str, verbosity: str, history: str = "",
+               defer_feedback: bool = False) -> dict:
+    try:
+        prompt, resp_limit = _persona_prompt(culture, persona, message, verbosity, history)
+
+        if defer_feedback:
+            # the feedback job outlives this request, so it doesn't take one of its slots
+            feedback_id = get_feedback_jobs().submit(_feedback, culture, message)
+            response = _generate(prompt, "persona")
+            return {
+                "response": truncate_text(response.text, max_chars=resp_limit),
+                "feedback": None,
+                "feedback_id": feedback_id,
+            }
+
+        response, feedback = _fan_out([
+            lambda: _generate(prompt, "persona"),
+            lambda: _feedback(culture, message),
+        ])
         return {
             "response": truncate_text(response.text, max_chars=resp_limit),
-            "feedback": truncate_text(feedback_response.text, max_chars=800)
+            "feedback": feedback,
         }
     except Exception as e:
-        raise Exception(f"Error generating response: {str(e)}")
+        raise Exception(f"Error generating response: {str(e)}") from e
+
+
+# The sidebar's canned follow-up questions, answered by FOLLOWUP_PERSONA. Their answers
+# are precomputed after a summary and cached like briefing sections.
+FOLLOWUP_TEMPLATES = (
+    "What gestures are considered rude in {culture}?",
+    "How do I greet someone older in {culture}?",
+    "What dress considerations should I know when visiting {culture}?",
+)
+FOLLOWUP_PERSONA = "local expert"
+# Free-text follow-ups at least this similar to a stored question reuse its answer.
+FOLLOWUP_SIMILARITY_THRESHOLD = float(os.getenv("FOLLOWUP_SIMILARITY_THRESHOLD", "0.75"))
+_followup_indexes = OrderedDict()  # (canonical culture key, verbosity) -> NearDuplicateIndex of question -> answer
+_followup_indexes_lock = threading.Lock()
+
+
+def followup_questions(culture: str) -> list:
+    return [t.format(culture=culture) for t in FOLLOWUP_TEMPLATES]
+
+
+def _followup_verbosity(verbosity: str) -> str:
+    # "custom" summaries and anything unexpected get medium-length replies, as in _persona_prompt
+    return verbosity if verbosity in ("concise", "detailed") else "medium"
+
+
+def _followup_index(culture: str, verbosity: str) -> NearDuplicateIndex:
+    return _lru_index(_followup_indexes, _followup_indexes_lock, (culture_key(culture), verbosity),
+                      FOLLOWUP_SIMILARITY_THRESHOLD)
+
+
+def _followup_cache_key(culture: str, question: str, verbosity: str) -> str:
+    prompt, _ = _persona_prompt(culture, FOLLOWUP_PERSONA, normalize_text(question), verbosity)
+    return briefing_cache_key(culture, verbosity, "followup", prompt, get_model_name())
+
+
+def stored_followup_answer(culture: str, question: str, verbosity: str = "medium"):
+    """A stored answer to `question` or a lexically near-identical one, or None; never calls the model."""
+    verbosity = _followup_verbosity(verbosity)
+    index = _followup_index(culture, verbosity)
+    near = index.lookup(question)
+    if near is not None:
+        return near[0]
+    result = get_response_cache().get(_followup_cache_key(culture, question, verbosity))
+    if result is not None:
+        index.add(question, result)
+    return result
+
+
+def _store_followup_answer(culture: str, question: str, verbosity: str, result: dict) -> None:
+    get_response_cache().set(_followup_cache_key(culture, question, verbosity), result)
+    _followup_index(culture, verbosity).add(question, result)
+
+
+def precompute_followups(culture: str, verbosity: str = "medium") -> int:
+    """Answer the templated follow-ups for `culture` ahead of time; returns how many were generated.
+
+    Only the persona reply is generated: etiquette feedback on our own canned
+    questions would never be shown.
+    """
+    verbosity = _followup_verbosity(verbosity)
+    generated = 0
+    for question in followup_questions(culture):
+        if stored_followup_answer(culture, question, verbosity) is None:
+            prompt, resp_limit = _persona_prompt(culture, FOLLOWUP_PERSONA, question, verbosity)
+            response = _generate(prompt, "persona")
+            result = {"response": truncate_text(response.text, max_chars=resp_limit), "feedback": None}
+            _store_followup_answer(culture, question, verbosity, result)
+            generated += 1
+    return generated
+
+
+def answer_followup(culture: str, question: str, verbosity: str = "medium", session=None) -> dict:
+    """Answer a follow-up as FOLLOWUP_PERSONA, serving stored answers before calling the model.
+
+    Stored answers are the precomputed templated follow-ups plus earlier answers to
+    free-text questions asked at the start of a conversation (answers given with
+    conversation history may depend on it, so they aren't reused).
+    """
+    verbosity = _followup_verbosity(verbosity)
+    stored = stored_followup_answer(culture, question, verbosity)
+    if stored is not None:
+        if session is not None:
+            with session.lock:
+                session.add_turn(question, stored["response"])
+                _compact_conversation(session)
+        return dict(stored, cached=True)
+
+    fresh_context = session is None or not session.history_text()
+    result = chat_with_persona(culture, FOLLOWUP_PERSONA, question, verbosity=verbosity, session=session)
+    if fresh_context:
+        _store_followup_answer(culture, question, verbosity, result)
+    return dict(result, cached=False)
+
+
+def stream_chat_with_persona(culture: str, persona: str, message: str, verbosity: str = "medium", session=None):
+    """Streaming variant of chat_with_persona.
+
+    Yields {"event": "delta", "section": "response", "text": chunk} while the persona
+    replies, then {"event": "section", "section": "feedback", ...} and finally
+    {"event": "done", "result": {"response": ..., "feedback": ...}}. The etiquette
+    feedback is requested in the background while the reply streams.
+    """
+    if session is None:
+        yield from _stream_chat_turn(culture, persona, message, verbosity)
+        return
+    with session.lock:
+        for event in _stream_chat_turn(culture, persona, message, verbosity, session.history_text()):
+            if event["event"] == "done":
+                session.add_turn(message, event["result"]["response"])
+                _compact_conversation(session)
+            yield event
+
+
+def _stream_chat_turn(culture: str, persona: str, message: str, verbosity: str, history: str = ""):
+    prompt, resp_limit = _persona_prompt(culture, persona, message, verbosity, history)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        feedback_future = pool.submit(_feedback, culture, message)
+        try:
+            parts = []
+            for text in _generate_stream(prompt, "persona"):
+                parts.append(text)
+                yield {"event": "delta", "section": "response", "text": text}
+            feedback = feedback_future.result()
+        except Exception as e:
+            raise Exception(f"Error generating response: {str(e)}") from e
+    yield {"event": "section", "section": "feedback", "text": feedback}
+    yield {"event": "done", "result": {
+        "response": truncate_text("".join(parts), max_chars=resp_limit),
+        "feedback": feedback,
+    }}
 
 
 def continue_text(existing_text: str) -> str:
@@ -306,15 +1075,7 @@ def continue_text(existing_text: str) -> str:
         if not existing_text:
             return ""
         # Provide a stronger instruction to avoid repetition and to only return new text.
-        # Include a short context window (last 400 chars) to keep prompt concise.
-        context = existing_text.strip()[-400:]
-        prompt = (
-            "Finish the last incomplete sentence from the text below and then add 1-2 concise sentences to complete the thought. "
-            "Do NOT repeat any of the existing words or sentences — return ONLY the new continuation text (no quotes, no extra commentary). "
-            "Keep the continuation short and directly connected to the previous content.\n\n"
-            f"TEXT CONTEXT:\n{context}"
-        )
-        cont = model.generate_content(prompt)
+        cont = _generate(_continuation_prompt(existing_text), "continue")
         return cont.text
     except Exception:
         return ""
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+
+# Finish reason reported when the model stopped because it hit its output-token limit.
+MAX_TOKENS = "MAX_TOKENS"
+
+
+class BackendResponse:
+    """Minimal response object shared by backends; mirrors the `.text` of a Gemini response."""
+
+    def __init__(self, text: str, finish_reason: str = "STOP", output_tokens: int = None):
+        self.text = text
+        self.finish_reason = finish_reason
+        self.output_tokens = output_tokens
+
+
+def finish_reason(response):
+    """Why the model stopped ("STOP", "MAX_TOKENS", ...) for any backend's response; None if unknown."""
+    reason = getattr(response, "finish_reason", None)
+    if reason is None:
+        # Gemini responses and stream chunks report it per candidate, as an enum
+        try:
+            reason = response.candidates[0].finish_reason
+        except (AttributeError, IndexError, TypeError):
+            return None
+    if reason is None:
+        return None
+    return getattr(reason, "name", None) or str(reason)
+
+
+def output_tokens(response):
+    """Tokens the model produced for `response`, if the backend reports it."""
+    count = getattr(response, "output_tokens", None)
+    if count is None:
+        count = getattr(getattr(response, "usage_metadata", None), "candidates_token_count", None)
+    return count
+
+
+def is_truncated(response, max_output_tokens: int = None) -> bool:
+    """True when the model ran out of output tokens rather than finishing its answer."""
+    if finish_reason(response) == MAX_TOKENS:
+        return True
+    count = output_tokens(response)
+    return bool(max_output_tokens and count and count >= max_output_tokens)
+
+
+class LLMBackend:
+    """Interface every generation path in `app.agents` goes through.
+
+    Subclasses implement `generate` (returns an object with a `.text` attribute) and
+    `generate_stream` (yields text chunks and returns the finish reason, so callers
+    can read it with `yield from`). `calls` counts model calls for benchmarks.
+    """
+
+    name = "base"
+    # Calls go through the process-wide limiter (app.limiter) unless this is False.
+    rate_limited = True
+
+    def __init__(self):
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def _count_call(self) -> None:
+        with self._calls_lock:
+            self.calls += 1
+
+    def reset_stats(self) -> None:
+        with self._calls_lock:
+            self.calls = 0
+
+    @property
+    def model_name(self) -> str:
+        raise NotImplementedError
+
+    def warm_up(self) -> None:
+        """Do any one-time setup ahead of the first call; a no-op by default."""
+
+    def generate(self, prompt: str, **kwargs):
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str, **kwargs):
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through google.generativeai, configured lazily on first use."""
+
+    name = "gemini"
+
+    # Try models in order of preference
+    models_to_try = ["gemini-2.0-flash", "gemini-1.5-flash", "gemini-pro", "gemini-1.5-pro"]
+
+    def __init__(self, api_key: str = None):
+        super().__init__()
+        self.api_key = api_key if api_key is not None else os.getenv("GEMINI_API_KEY")
+        self._model = None
+        self._model_name = None
+        self._model_lock = threading.Lock()
+
+    def get_model(self):
+        """Configure Gemini and resolve the preferred available model once, on first use."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # Initialize API and model
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+
+                    for name in self.models_to_try:
+                        try:
+                            candidate = genai.GenerativeModel(name)
+                            print(f"Using model: {name}")
+                            self._model_name = name
+                            self._model = candidate
+                            break
+                        except Exception as e:
+                            print(f"Model {name} not available: {e}")
+                            continue
+
+                    if self._model is None:
+                        raise Exception("No available models found. Check your API key.")
+        return self._model
+
+    @property
+    def model_name(self) -> str:
+        self.get_model()
+        return self._model_name
+
+    def warm_up(self) -> None:
+        self.get_model()
+
+    def generate(self, prompt: str, **kwargs):
+        self._count_call()
+        return self.get_model().generate_content(prompt, **kwargs)
+
+    def generate_stream(self, prompt: str, **kwargs):
+        self._count_call()
+        reason = None
+        for chunk in self.get_model().generate_content(prompt, stream=True, **kwargs):
+            # the final chunk carries the finish reason
+            reason = finish_reason(chunk) or reason
+            try:
+                text = chunk.text
+            except Exception:
+                # chunks without text parts (e.g. safety metadata) carry nothing to show
+                continue
+            if text:
+                yield text
+        return reason
+
+
+_OFFLINE_WORDS = (
+    "greet", "politely", "with", "a", "slight", "bow", "handshake", "elders", "first", "titles",
+    "family", "names", "avoid", "pointing", "shoes", "indoors", "gifts", "both", "hands", "punctual",
+    "meetings", "direct", "indirect", "tone", "quietly", "public", "dress", "modestly", "temples",
+    "tipping", "dining", "chopsticks", "toast", "hosts", "compliments", "small", "talk", "respect",
+)
+
+
+class OfflineBackend(LLMBackend):
+    """Deterministic local backend for benchmarks, load tests and profiling without credentials.
+
+    The same prompt always yields the same text. `latency_ms` is slept per call (split
+    across chunks when streaming) and `output_chars` bounds the response length, so the
+    orchestration, caching and rendering layers can be measured apart from the model.
+    Prompts asking for JSON get a well-formed briefing object. With `max_output_tokens`
+    (or `generation_config={"max_output_tokens": n}`) longer texts are cut off and
+    reported with finish reason MAX_TOKENS, like a real model hitting its limit.
+    """
+
+    name = "offline"
+    # no quota to protect, and benchmarks should measure orchestration, not the token bucket
+    rate_limited = False
+
+    def __init__(self, latency_ms: float = 0.0, output_chars: int = 600, chunk_chars: int = 40,
+                 max_output_tokens: int = None):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.output_chars = output_chars
+        self.chunk_chars = max(1, chunk_chars)
+        self.max_output_tokens = max_output_tokens
+
+    @property
+    def model_name(self) -> str:
+        return f"offline-{self.output_chars}"
+
+    def _text(self, prompt: str, size: int = None) -> str:
+        size = size or self.output_chars
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        lines, length, n = [], 0, 1
+        while length < size:
+            words = [rng.choice(_OFFLINE_WORDS) for _ in range(rng.randint(6, 14))]
+            line = f"{n}. " + " ".join(words).capitalize() + "."
+            lines.append(line)
+            length += len(line) + 1
+            n += 1
+        return "\n".join(lines)[:size].rstrip(" .") + "."
+
+    def _render(self, prompt: str, **kwargs) -> BackendResponse:
+        config = kwargs.get("generation_config") or {}
+        if config.get("response_mime_type") == "application/json":
+            fields = ("summary", "etiquette", "communication_style", "tips", "mistakes")
+            per_field = max(40, self.output_chars // len(fields))
+            text = json.dumps({f: self._text(f"{prompt}\n{f}", per_field) for f in fields})
+        else:
+            text = self._text(prompt)
+        # ~4 characters per token, the same estimate used for chat history budgets
+        tokens = (len(text) + 3) // 4
+        limit = config.get("max_output_tokens") or self.max_output_tokens
+        if limit and tokens > limit:
+            return BackendResponse(text[:limit * 4], finish_reason=MAX_TOKENS, output_tokens=limit)
+        return BackendResponse(text, output_tokens=tokens)
+
+    def generate(self, prompt: str, **kwargs):
+        self._count_call()
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        return self._render(prompt, **kwargs)
+
+    def generate_stream(self, prompt: str, **kwargs):
+        self._count_call()
+        response = self._render(prompt, **kwargs)
+        text = response.text
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        for chunk in chunks:
+            if self.latency_ms:
+                time.sleep(self.latency_ms / 1000.0 / len(chunks))
+            yield chunk
+        return response.finish_reason
+
+
+BACKENDS = {"gemini": GeminiBackend, "offline": OfflineBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _backend_from_env() -> LLMBackend:
+    name = os.getenv("LLM_BACKEND", "gemini").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    if name == "offline":
+        return OfflineBackend(
+            latency_ms=float(os.getenv("OFFLINE_LATENCY_MS", "0")),
+            output_chars=int(os.getenv("OFFLINE_OUTPUT_CHARS", "600")),
+            max_output_tokens=int(os.getenv("OFFLINE_MAX_OUTPUT_TOKENS", "0")) or None,
+        )
+    return GeminiBackend()
+
+
+def get_backend() -> LLMBackend:
+    """Return the process-wide backend, chosen from $LLM_BACKEND on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _backend_from_env()
+    return _backend
+
+
+def set_backend(backend: LLMBackend) -> LLMBackend:
+    """Replace the process-wide backend (e.g. with an OfflineBackend); returns the previous one."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.metrics import CACHE_REQUESTS, RESPONSE_CACHE_REQUESTS, SEARCH_CACHE_REQUESTS
+
+
+def briefing_cache_key(culture: str, verbosity: str, section: str, prompt: str, model_name: str) -> str:
+    """Build a cache key from the normalized culture, verbosity, section, prompt hash and model name.
+
+    Hashing the full prompt text means any change to a prompt template invalidates
+    the entries generated from the old wording.
+    """
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    raw = json.dumps([culture.strip().lower(), verbosity, section, prompt_hash, model_name or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class BriefingCache:
+    """Disk-backed, TTL-expiring, size-bounded cache shared by every process on the host.
+
+    Values are stored as JSON in a SQLite database in WAL mode, so several uvicorn
+    workers and Streamlit sessions can read and write it concurrently. Entries older
+    than `ttl_seconds` are treated as misses, and once more than `max_entries` are
+    stored the least recently used ones are evicted. A hit refreshes an entry's
+    access time at most once per `touch_interval_seconds`, so hot keys don't turn
+    every read into a write.
+
+    Cache failures never break generation: errors are logged and treated as misses.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 7 * 24 * 3600, max_entries: int = 5000,
+                 requests_counter=CACHE_REQUESTS, touch_interval_seconds: float = 60):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.touch_interval_seconds = touch_interval_seconds
+        self.hits = 0
+        self.misses = 0
+        self._requests = requests_counter
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared across threads; keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        """Return the cached value for `key`, or None if it is missing or expired."""
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at, accessed_at FROM entries WHERE key = ?",
+                               (key,)).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                self._requests.inc(result="miss")
+                return None
+            if now - row[2] >= self.touch_interval_seconds:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self._requests.inc(result="hit")
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Briefing cache read failed: {e}")
+            self.misses += 1
+            self._requests.inc(result="miss")
+            return None
+
+    def set(self, key: str, value) -> None:
+        """Store a JSON-serializable value and evict the oldest entries beyond `max_entries`."""
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(conn, now)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Briefing cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        try:
+            self._connect().execute("DELETE FROM entries")
+        except sqlite3.Error as e:
+            print(f"Briefing cache clear failed: {e}")
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+_briefing_cache = None
+_briefing_cache_lock = threading.Lock()
+
+
+def get_briefing_cache() -> BriefingCache:
+    """Return the process-wide briefing cache, configured from the environment on first use."""
+    global _briefing_cache
+    if _briefing_cache is None:
+        with _briefing_cache_lock:
+            if _briefing_cache is None:
+                _briefing_cache = BriefingCache(
+                    os.getenv("BRIEFING_CACHE_PATH", os.path.join(".cache", "briefings.sqlite3")),
+                    ttl_seconds=int(os.getenv("BRIEFING_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+                    max_entries=int(os.getenv("BRIEFING_CACHE_MAX_ENTRIES", "5000")),
+                )
+    return _briefing_cache
+
+
+_search_cache = None
+
+
+def get_search_cache() -> BriefingCache:
+    """Return the process-wide related-resources cache, keyed per place.
+
+    Search results change slowly, so they are kept for a day by default and shared
+    across workers and Streamlit reruns the same way briefings are.
+    """
+    global _search_cache
+    if _search_cache is None:
+        with _briefing_cache_lock:
+            if _search_cache is None:
+                _search_cache = BriefingCache(
+                    os.getenv("SEARCH_CACHE_PATH", os.path.join(".cache", "search.sqlite3")),
+                    ttl_seconds=int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 3600))),
+                    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000")),
+                    requests_counter=SEARCH_CACHE_REQUESTS,
+                )
+    return _search_cache
+
+
+_response_cache = None
+
+
+def get_response_cache() -> BriefingCache:
+    """Return the process-wide cache of per-message answers (etiquette feedback, follow-ups).
+
+    Kept apart from the briefing cache so a stream of one-off chat messages can't
+    LRU-evict the briefings.
+    """
+    global _response_cache
+    if _response_cache is None:
+        with _briefing_cache_lock:
+            if _response_cache is None:
+                _response_cache = BriefingCache(
+                    os.getenv("RESPONSE_CACHE_PATH", os.path.join(".cache", "responses.sqlite3")),
+                    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+                    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "20000")),
+                    requests_counter=RESPONSE_CACHE_REQUESTS,
+                )
+    return _response_cache
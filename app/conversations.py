@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); close enough for budgeting prompts."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+class ConversationSession:
+    """History of one user's conversation with one persona.
+
+    Holds the most recent turns verbatim plus a rolling summary of everything older.
+    Callers hold `lock` while reading and updating a session so concurrent messages
+    in the same conversation are answered in order.
+    """
+
+    def __init__(self, culture: str, persona: str):
+        self.culture = culture
+        self.persona = persona
+        self.summary = ""
+        self.turns = []  # [(user_message, reply), ...], oldest first
+        self.lock = threading.Lock()
+        self.updated_at = time.monotonic()
+
+    def history_tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(u) + estimate_tokens(r) for u, r in self.turns)
+
+    def history_text(self) -> str:
+        """The history block included in persona prompts; empty for a new conversation."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+        if self.turns:
+            lines = []
+            for user_message, reply in self.turns:
+                lines.append(f"User: {user_message}")
+                lines.append(f"You: {reply}")
+            parts.append("Most recent messages:\n" + "\n".join(lines))
+        return "\n\n".join(parts)
+
+    def add_turn(self, user_message: str, reply: str) -> None:
+        self.turns.append((user_message, reply))
+        self.updated_at = time.monotonic()
+
+    def take_overflow(self, token_budget: int) -> list:
+        """Remove and return the oldest turns until the history fits `token_budget`.
+
+        Drops down to half the budget so compaction happens every few turns rather
+        than on every message; the latest turn is always kept verbatim.
+        """
+        if self.history_tokens() <= token_budget:
+            return []
+        target = token_budget // 2
+        overflow = []
+        while len(self.turns) > 1 and self.history_tokens() > target:
+            overflow.append(self.turns.pop(0))
+        return overflow
+
+
+class ConversationStore:
+    """In-process conversation sessions keyed by (username, culture, persona).
+
+    Bounded two ways: sessions idle for longer than `ttl_seconds` expire, and past
+    `max_sessions` the least recently used session is evicted.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(username: str, culture: str, persona: str) -> tuple:
+        return (username, culture.strip().lower(), " ".join(persona.lower().split()))
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - session.updated_at > self.ttl_seconds:
+                del self._sessions[key]
+            else:
+                break
+
+    def get(self, username: str, culture: str, persona: str) -> ConversationSession:
+        """Return the live session for this conversation, starting a new one if needed."""
+        key = self._key(username, culture, persona)
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and now - session.updated_at > self.ttl_seconds:
+                session = None
+            if session is None:
+                session = ConversationSession(culture, persona)
+                self._sessions[key] = session
+            session.updated_at = now
+            self._sessions.move_to_end(key)
+            self._evict(now)
+        return session
+
+    def peek(self, username: str, culture: str, persona: str):
+        """The existing session, or None; does not create or refresh one."""
+        with self._lock:
+            return self._sessions.get(self._key(username, culture, persona))
+
+    def reset(self, username: str, culture: str, persona: str) -> None:
+        with self._lock:
+            self._sessions.pop(self._key(username, culture, persona), None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# Persona prompts carry at most this many tokens of history; older turns are compacted.
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1200"))
+# Upper bound for the rolling summary produced by compaction.
+SUMMARY_TOKEN_LIMIT = int(os.getenv("CHAT_SUMMARY_TOKEN_LIMIT", "250"))
+
+_conversations = None
+_conversations_lock = threading.Lock()
+
+
+def get_conversations() -> ConversationStore:
+    """Return the process-wide conversation store, configured from the environment on first use."""
+    global _conversations
+    if _conversations is None:
+        with _conversations_lock:
+            if _conversations is None:
+                _conversations = ConversationStore(
+                    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", "1000")),
+                    ttl_seconds=float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600")),
+                )
+    return _conversations
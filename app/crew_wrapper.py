@@ -1,9 +1,99 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from app.agents import (
+    DEFAULT_BRIEFING_MODE,
+    FOLLOWUP_PERSONA,
+    answer_followup,
+    cached_culture_summary,
     generate_culture_summary,
+    generate_summary_section,
     chat_with_persona,
+    planned_calls,
+    reserve_calls,
+    stream_culture_summary,
+    stream_chat_with_persona,
+    precompute_followups,
 )
 from app.utils import now_iso, fetch_google_search_results
+from app.cultures import canonicalize_culture, culture_key
+from app.cache import get_search_cache
+from app.conversations import get_conversations
+from app.feedback_jobs import get_feedback_jobs
+from app.notes_store import get_notes_store
+from app.search_index import get_search_index
+from app.singleflight import SingleFlight
+from app.snapshot import get_snapshot
+
+# Shared by every CultureCrew in the process so identical concurrent requests
+# (a trending country, say) cost one set of model or search calls.
+_summary_flights = SingleFlight("summary")
+_resource_flights = SingleFlight("resources")
+
+class _StreamAbandoned(Exception):
+    """The streaming request leading a coalesced summary went away before it finished."""
+
+
+def _summary_key(culture: str, verbosity: str, sections=None, mode=None) -> tuple:
+    # streamed and non-streamed requests share keys, so they coalesce with each other
+    return (culture_key(culture), verbosity, tuple(sections) if sections is not None else None,
+            (mode or DEFAULT_BRIEFING_MODE).strip().lower())
+
+
+# Misses in a batch are generated this many at a time.
+BATCH_MAX_PARALLEL = max(1, int(os.getenv("BATCH_MAX_PARALLEL", "4")))
+
+
+def _snapshot_summary(culture: str, verbosity: str, sections=None, mode=None):
+    """Serve a pre-generated briefing from the loaded snapshot, if it has one for this request."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+    # only serve briefings produced by the same generation mode as requested;
+    # normalized like the cache keys, so " JSON " and "json" agree
+    wanted_mode = (mode or DEFAULT_BRIEFING_MODE).strip().lower()
+    if wanted_mode != str(snapshot.meta.get("mode", "legacy")).strip().lower():
+        return None
+    result = snapshot.get(culture_key(culture), (verbosity or "medium").strip().lower())
+    if result is not None:
+        result["sections"] = sections
+        result.setdefault("missing", [])
+    return result
+
+
+# Templated follow-up answers are precomputed here once a summary has been shown to a user.
+_followup_pool = ThreadPoolExecutor(max_workers=int(os.getenv("FOLLOWUP_WORKERS", "2")), thread_name_prefix="followups")
+_followups_pending = set()
+_followups_lock = threading.Lock()
+
+
+def _warm_followups(culture: str, verbosity: str) -> None:
+    """Precompute the templated follow-up answers in the background (once per culture at a time)."""
+    key = (culture_key(culture), verbosity)
+    with _followups_lock:
+        if key in _followups_pending:
+            return
+        _followups_pending.add(key)
+
+    def run():
+        try:
+            precompute_followups(culture, verbosity)
+        except Exception as e:
+            print(f"Precomputing follow-ups for {culture} failed: {e}")
+        finally:
+            with _followups_lock:
+                _followups_pending.discard(key)
+
+    _followup_pool.submit(run)
+
+
+def _index_briefing(culture: str, verbosity: str, result: dict) -> None:
+    """Add a generated briefing to the search index; indexing never fails a request."""
+    try:
+        get_search_index().index_briefing(culture, verbosity, result, now_iso())
+    except Exception as e:
+        print(f"Search indexing failed for {culture} briefing: {e}")
 
 
 class CultureCrew:
@@ -26,39 +116,274 @@ class CultureCrew:
             print("Google Custom Search API credentials are missing.")
             return []
 
+        place = canonicalize_culture(place)
         # Refined query for best relevance
         query = f"{place} culture traditions etiquette customs site:.org OR site:.gov OR site:.edu"
-        results = fetch_google_search_results(query, api_key, search_engine_id)
-        # Filter out any non-web URLs
-        filtered_results = [r for r in results if filter_resource_links([r.get('url')])]
-        return filtered_results
+
+        key = culture_key(place)
+        cache = get_search_cache()
+        cache_key = f"resources|{key}|{query}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        def fetch():
+            results = fetch_google_search_results(query, api_key, search_engine_id)
+            # Filter out any non-web URLs
+            results = [r for r in results if filter_resource_links([r.get('url')])]
+            # an empty list usually means the search failed; try again next time
+            if results:
+                cache.set(cache_key, results)
+            return results
+
+        return _resource_flights.do(key, fetch)
 
     def __init__(self):
-        self.notes = {}  # simple in-memory store
+        self.notes = get_notes_store()
+        self.conversations = get_conversations()
+
+    # Culture names are canonicalized ("japanese", "JP", "日本" -> "Japan") before reaching
+    # the model layer so equivalent requests share cache entries.
 
     def generate_summary(self, culture: str, username: str):
         # default verbosity is 'medium' if not provided by caller
-        return generate_culture_summary(culture)
+        return self.generate_summary_with_verbosity(culture, username)
+
+    def generate_summary_with_verbosity(self, culture: str, username: str, verbosity: str = "medium", sections=None, mode=None):
+        culture = canonicalize_culture(culture)
+        snapshot_hit = _snapshot_summary(culture, verbosity, sections, mode)
+        if snapshot_hit is not None:
+            return snapshot_hit
+        key = _summary_key(culture, verbosity, sections, mode)
+
+        def generate():
+            result = generate_culture_summary(culture, verbosity=verbosity, sections=sections, mode=mode)
+            if sections is None:
+                _index_briefing(culture, verbosity, result)
+            return result
+
+        return _summary_flights.do(key, generate)
 
-    def generate_summary_with_verbosity(self, culture: str, username: str, verbosity: str = "medium", sections=None):
-        return generate_culture_summary(culture, verbosity=verbosity, sections=sections)
+    def reserve_summary(self, culture: str, verbosity: str = "medium", sections=None, mode=None):
+        """Reserve the model calls a summary will make, none if it's already cached.
+
+        Raises `RateLimitExceeded` when they don't fit; see `GeminiLimiter.reserve`.
+        """
+        culture = canonicalize_culture(culture)
+        try:
+            cached = _snapshot_summary(culture, verbosity, sections, mode) or \
+                cached_culture_summary(culture, verbosity=verbosity, sections=sections, mode=mode)
+        except Exception:
+            cached = None
+        return reserve_calls(0 if cached is not None else planned_calls(sections, mode))
+
+    def reserve_section(self, culture: str, section: str, verbosity: str = "medium"):
+        """Reserve the model calls `fill_summary_section` will make."""
+        return self.reserve_summary(culture, verbosity, sections=[section], mode="legacy")
+
+    def reserve_chat(self, defer_feedback: bool = False):
+        """Reserve a chat turn's model calls: the reply, plus the feedback unless it's deferred."""
+        return reserve_calls(1 if defer_feedback else 2)
+
+    def warm_followups(self, culture: str, verbosity: str = "medium") -> None:
+        """Precompute the templated follow-up answers in the background.
+
+        Call it after a summary has been shown interactively, where the suggested
+        follow-ups are offered; API and batch summaries don't pay for it.
+        """
+        _warm_followups(canonicalize_culture(culture), verbosity)
+
+    def fill_summary_section(self, culture: str, username: str, section: str, verbosity: str = "medium"):
+        """Text for one summary section that was left out of a custom summary."""
+        return generate_summary_section(canonicalize_culture(culture), section, verbosity=verbosity)
+
+    def generate_summaries_batch(self, items, username: str, mode=None, max_parallel: int = None):
+        """Generate summaries for many (culture, verbosity) pairs at once.
+
+        Items are de-duplicated after canonicalization, cache hits are served without
+        touching the model, and misses run in parallel (at most `max_parallel` at a
+        time). One failing culture doesn't fail the batch: every input item gets its
+        own entry, in input order, with either a `result` or an `error`.
+        """
+        unique = {}
+        slots = []
+        for culture, verbosity in items:
+            canonical = canonicalize_culture(culture)
+            key = (culture_key(canonical), verbosity or "medium")
+            unique.setdefault(key, canonical)
+            slots.append((culture, key))
+
+        outcomes = {}
+        misses = []
+        for key, canonical in unique.items():
+            try:
+                cached = _snapshot_summary(canonical, key[1], mode=mode) or \
+                    cached_culture_summary(canonical, verbosity=key[1], mode=mode)
+            except Exception:
+                cached = None
+            if cached is not None:
+                outcomes[key] = {"status": "ok", "cached": True, "result": cached}
+            else:
+                misses.append(key)
+
+        def generate(key):
+            # each item reserves its own calls, so it either runs to completion or fails before starting
+            try:
+                reservation = reserve_calls(planned_calls(mode=mode))
+            except Exception as e:
+                return {"status": "error", "cached": False, "error": str(e)}
+            try:
+                time.sleep(reservation.delay)
+                result = reservation.run(self.generate_summary_with_verbosity, unique[key], username,
+                                         verbosity=key[1], mode=mode)
+                return {"status": "ok", "cached": False, "result": result}
+            except Exception as e:
+                return {"status": "error", "cached": False, "error": str(e)}
+            finally:
+                reservation.close()
+
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(len(misses), max_parallel or BATCH_MAX_PARALLEL)) as pool:
+                for key, outcome in zip(misses, pool.map(generate, misses)):
+                    outcomes[key] = outcome
+
+        return [
+            dict(outcomes[key], culture=culture, canonical_culture=unique[key], verbosity=key[1])
+            for culture, key in slots
+        ]
+
+    def stream_summary_with_verbosity(self, culture: str, username: str, verbosity: str = "medium", sections=None,
+                                      mode=None):
+        """Yield summary events as they are produced; see `stream_culture_summary`.
+
+        Only the legacy mode streams; other modes yield a single "done" event with the
+        regular result. Identical in-flight requests (streamed or not) are coalesced:
+        followers wait for the leader and get just the "done" event.
+        """
+        culture = canonicalize_culture(culture)
+        snapshot_hit = _snapshot_summary(culture, verbosity, sections, mode)
+        if snapshot_hit is not None:
+            return iter([{"event": "done", "result": snapshot_hit}])
+
+        def generate():
+            return self.generate_summary_with_verbosity(culture, username, verbosity=verbosity, sections=sections,
+                                                        mode=mode)
+
+        key = _summary_key(culture, verbosity, sections, mode)
+
+        def whole():
+            yield {"event": "done", "result": generate()}
+
+        if key[3] != "legacy":
+            return whole()
+
+        def events():
+            call, leader = _summary_flights.begin(key)
+            if not leader:
+                try:
+                    result = _summary_flights.wait(call)
+                except _StreamAbandoned:
+                    result = generate()
+                yield {"event": "done", "result": result}
+                return
+
+            finished = False
+            try:
+                for event in stream_culture_summary(culture, verbosity=verbosity, sections=sections):
+                    if event.get("event") == "done":
+                        if sections is None:
+                            _index_briefing(culture, verbosity, event["result"])
+                        _summary_flights.finish(key, call, result=event["result"])
+                        finished = True
+                    yield event
+            except Exception as e:
+                if not finished:
+                    _summary_flights.finish(key, call, error=e)
+                    finished = True
+                raise
+            finally:
+                if not finished:
+                    _summary_flights.finish(key, call, error=_StreamAbandoned())
+
+        return events()
+
+    # Chats are multi-turn: each (username, culture, persona) has a server-side session whose
+    # history is included in the persona prompt. `new_conversation` starts it afresh.
+
+    def _conversation(self, username, culture, persona, new_conversation=False):
+        if new_conversation:
+            self.conversations.reset(username, culture, persona)
+        return self.conversations.get(username, culture, persona)
 
     def chat_as_culture(self, culture, persona, message, username):
-        return chat_with_persona(culture, persona, message)
+        return self.chat_as_culture_with_verbosity(culture, persona, message, username)
+
+    def chat_as_culture_with_verbosity(self, culture, persona, message, username, verbosity: str = "medium",
+                                       new_conversation: bool = False, defer_feedback: bool = False):
+        culture = canonicalize_culture(culture)
+        session = self._conversation(username, culture, persona, new_conversation)
+        return chat_with_persona(culture, persona, message, verbosity=verbosity, session=session,
+                                 defer_feedback=defer_feedback)
+
+    def answer_followup(self, culture, question, username, verbosity: str = "medium"):
+        """Answer a summary follow-up as the local expert; stored answers come back instantly."""
+        culture = canonicalize_culture(culture)
+        session = self.conversations.get(username, culture, FOLLOWUP_PERSONA)
+        return answer_followup(culture, question, verbosity=verbosity, session=session)
 
-    def chat_as_culture_with_verbosity(self, culture, persona, message, username, verbosity: str = "medium"):
-        return chat_with_persona(culture, persona, message, verbosity=verbosity)
+    def get_feedback(self, feedback_id):
+        """Status of deferred etiquette feedback; None if the id is unknown or expired."""
+        return get_feedback_jobs().status(feedback_id)
+
+    def stream_chat_as_culture(self, culture, persona, message, username, verbosity: str = "medium",
+                               new_conversation: bool = False):
+        """Yield chat events as they are produced; see `stream_chat_with_persona`."""
+        culture = canonicalize_culture(culture)
+        session = self._conversation(username, culture, persona, new_conversation)
+        return stream_chat_with_persona(culture, persona, message, verbosity=verbosity, session=session)
+
+    def get_conversation(self, username, culture, persona):
+        """The conversation so far: {"summary": ..., "turns": [{"user": ..., "reply": ...}, ...]}."""
+        session = self.conversations.peek(username, canonicalize_culture(culture), persona)
+        if session is None:
+            return {"summary": "", "turns": []}
+        with session.lock:
+            return {"summary": session.summary, "turns": [{"user": u, "reply": r} for u, r in session.turns]}
+
+    def reset_conversation(self, username, culture, persona):
+        self.conversations.reset(username, canonicalize_culture(culture), persona)
 
     def save_note(self, username, culture, user_message, model_output):
-        if username not in self.notes:
-            self.notes[username] = []
-
-        self.notes[username].append({
-            "title": f"{culture} — Chat Note",
-            "culture": culture,
-            "content": f"User: {user_message}\n\nModel: {model_output}",
-            "created_at": now_iso()
-        })
-
-    def get_notes(self, username):
-        return self.notes.get(username, [])
+        # stored and indexed under the canonical name so culture filters find it
+        culture = canonicalize_culture(culture)
+        title = f"{culture} — Chat Note"
+        content = f"User: {user_message}\n\nModel: {model_output}"
+        created_at = now_iso()
+        note_id = self.notes.add(username, culture, title=title, content=content, created_at=created_at)
+        try:
+            get_search_index().index_note(note_id, username, culture, title, content, created_at,
+                                          store_id=self.notes.store_id)
+        except Exception as e:
+            print(f"Search indexing failed for note {note_id}: {e}")
+        return note_id
+
+    def get_notes(self, username, limit: int = 50, cursor: str = None, culture: str = None):
+        """Return one page of a user's notes, oldest first: {"notes": [...], "next_cursor": ...}."""
+        if culture:
+            culture = canonicalize_culture(culture)
+        notes, next_cursor = self.notes.page(username, limit=limit, cursor=cursor, culture=culture)
+        return {"notes": notes, "next_cursor": next_cursor}
+
+    def iter_notes(self, username, culture: str = None):
+        """Yield all of a user's notes, oldest first, without loading them all at once."""
+        return self.notes.iter_notes(username, culture=canonicalize_culture(culture) if culture else None)
+
+    def notes_version(self, username):
+        """Changes whenever the user saves a note; use it to key caches of derived note data."""
+        return self.notes.latest(username)
+
+    def search(self, query: str, username: str = None, culture: str = None, kind: str = None, limit: int = 20):
+        """Ranked keyword/phrase search over `username`'s notes and the shared briefings (briefings only without one)."""
+        if culture:
+            culture = canonicalize_culture(culture)
+        return get_search_index().search(query, username=username, culture=culture, kind=kind, limit=limit)
@@ -0,0 +1,290 @@
+import difflib
+import re
+import unicodedata
+from functools import lru_cache
+
+# Bundled alias index: one country per line as
+#   Canonical name | ISO alpha-2 | ISO alpha-3 | demonyms | other aliases (native names, old names, misspellings)
+# List fields are comma-separated. Matching is case-, accent- and punctuation-insensitive.
+# Regions, cities and ethnic groups (Scotland, Dubai, Persian, ...) are deliberately not
+# aliases: they are cultures of their own and must not be replaced by the country.
+_CULTURE_DATA = """
+Afghanistan|AF|AFG|Afghan|افغانستان,Afganistan
+Albania|AL|ALB|Albanian|Shqipëri,Shqiperia,Albnia
+Algeria|DZ|DZA|Algerian|الجزائر,Algerie
+Andorra|AD|AND|Andorran|
+Angola|AO|AGO|Angolan|
+Antigua and Barbuda|AG|ATG|Antiguan,Barbudan|
+Argentina|AR|ARG|Argentine,Argentinian,Argentinean|Argentine Republic,Argentinia,Argentia
+Armenia|AM|ARM|Armenian|Հայաստան,Hayastan
+Australia|AU|AUS|Australian,Aussie|Oz,Austrailia,Australlia
+Austria|AT|AUT|Austrian|Österreich,Osterreich,Oesterreich,Austira
+Azerbaijan|AZ|AZE|Azerbaijani,Azeri|Azərbaycan,Azerbaycan,Azerbaijian
+Bahamas|BS|BHS|Bahamian|The Bahamas
+Bahrain|BH|BHR|Bahraini|البحرين,Bahrein
+Bangladesh|BD|BGD|Bangladeshi|বাংলাদেশ,Bangaldesh
+Barbados|BB|BRB|Barbadian,Bajan|
+Belarus|BY|BLR|Belarusian,Belarusan|Беларусь,Byelorussia,White Russia
+Belgium|BE|BEL|Belgian|België,Belgie,Belgique,Belgien,Belguim
+Belize|BZ|BLZ|Belizean|
+Benin|BJ|BEN|Beninese|Dahomey
+Bhutan|BT|BTN|Bhutanese|འབྲུག,Druk Yul
+Bolivia|BO|BOL|Bolivian|Plurinational State of Bolivia
+Bosnia and Herzegovina|BA|BIH|Bosnian,Herzegovinian|Bosnia,Bosna i Hercegovina,BiH
+Botswana|BW|BWA|Motswana,Batswana,Botswanan|
+Brazil|BR|BRA|Brazilian|Brasil,Brazill
+Brunei|BN|BRN|Bruneian|Brunei Darussalam
+Bulgaria|BG|BGR|Bulgarian|България,Balgariya
+Burkina Faso|BF|BFA|Burkinabe,Burkinabé|Upper Volta
+Burundi|BI|BDI|Burundian|
+Cabo Verde|CV|CPV|Cape Verdean|Cape Verde
+Cambodia|KH|KHM|Cambodian,Khmer|កម្ពុជា,Kampuchea,Cambodja
+Cameroon|CM|CMR|Cameroonian|Cameroun
+Canada|CA|CAN|Canadian|Kanada,Canda
+Central African Republic|CF|CAF|Central African|CAR,Centrafrique
+Chad|TD|TCD|Chadian|Tchad
+Chile|CL|CHL|Chilean|Chili
+China|CN|CHN|Chinese|中国,中國,Zhongguo,PRC,People's Republic of China,Mainland China,Chine
+Colombia|CO|COL|Colombian|Columbia
+Comoros|KM|COM|Comoran,Comorian|
+Congo|CG|COG|Congolese|Republic of the Congo,Congo-Brazzaville
+Costa Rica|CR|CRI|Costa Rican|
+Croatia|HR|HRV|Croatian,Croat|Hrvatska,Croatie
+Cuba|CU|CUB|Cuban|
+Cyprus|CY|CYP|Cypriot|Κύπρος,Kıbrıs,Kypros
+Czechia|CZ|CZE|Czech|Czech Republic,Česko,Cesko,Česká republika,Czechoslovakia
+Democratic Republic of the Congo|CD|COD|Congolese|DRC,DR Congo,Congo-Kinshasa,Zaire
+Denmark|DK|DNK|Danish,Dane|Danmark,Denmrak
+Djibouti|DJ|DJI|Djiboutian|
+Dominica|DM|DMA||Commonwealth of Dominica
+Dominican Republic|DO|DOM|Dominican|República Dominicana,Republica Dominicana
+Ecuador|EC|ECU|Ecuadorian,Ecuadorean|
+Egypt|EG|EGY|Egyptian|مصر,Misr,Egipt,Eygpt
+El Salvador|SV|SLV|Salvadoran,Salvadorean|
+Equatorial Guinea|GQ|GNQ|Equatorial Guinean,Equatoguinean|
+Eritrea|ER|ERI|Eritrean|
+Estonia|EE|EST|Estonian|Eesti
+Eswatini|SZ|SWZ|Swazi,Liswati|Swaziland
+Ethiopia|ET|ETH|Ethiopian|ኢትዮጵያ,Abyssinia,Ethopia
+Fiji|FJ|FJI|Fijian|Viti
+Finland|FI|FIN|Finnish,Finn|Suomi,Finnland
+France|FR|FRA|French|Frence,Frnace
+Gabon|GA|GAB|Gabonese|
+Gambia|GM|GMB|Gambian|The Gambia
+Georgia|GE|GEO|Georgian|საქართველო,Sakartvelo
+Germany|DE|DEU|German|Deutschland,Allemagne,Alemania,Germnay,Gemany
+Ghana|GH|GHA|Ghanaian|Gold Coast
+Greece|GR|GRC|Greek|Ελλάδα,Ellada,Hellas,Grece,Greese
+Grenada|GD|GRD|Grenadian|
+Guatemala|GT|GTM|Guatemalan|
+Guinea|GN|GIN|Guinean|Guinée
+Guinea-Bissau|GW|GNB|Bissau-Guinean|
+Guyana|GY|GUY|Guyanese|
+Haiti|HT|HTI|Haitian|Haïti,Ayiti
+Honduras|HN|HND|Honduran|
+Hong Kong|HK|HKG|Hongkonger,Hong Konger|香港,Hongkong
+Hungary|HU|HUN|Hungarian,Magyar|Magyarország,Magyarorszag,Hungry
+Iceland|IS|ISL|Icelandic,Icelander|Ísland
+India|IN|IND|Indian|भारत,Bharat,Hindustan,Inida
+Indonesia|ID|IDN|Indonesian|Indonesien,Indonisia
+Iran|IR|IRN|Iranian|ایران,Persia,Islamic Republic of Iran
+Iraq|IQ|IRQ|Iraqi|العراق,Irak
+Ireland|IE|IRL|Irish|Éire,Eire,Republic of Ireland,Irland
+Israel|IL|ISR|Israeli|ישראל,Yisrael
+Italy|IT|ITA|Italian|Italia,Italie,Itlay,Italien
+Ivory Coast|CI|CIV|Ivorian|Côte d'Ivoire,Cote d'Ivoire,Cote dIvoire
+Jamaica|JM|JAM|Jamaican|
+Japan|JP|JPN|Japanese|日本,にっぽん,にほん,Nippon,Nihon,Japon,Japn,Jpan,Japam
+Jordan|JO|JOR|Jordanian|الأردن,Urdun
+Kazakhstan|KZ|KAZ|Kazakh,Kazakhstani|Қазақстан,Казахстан,Qazaqstan,Kazakstan
+Kenya|KE|KEN|Kenyan|
+Kiribati|KI|KIR|I-Kiribati|
+Kuwait|KW|KWT|Kuwaiti|الكويت
+Kyrgyzstan|KG|KGZ|Kyrgyz,Kyrgyzstani|Kirghizia,Kyrgyz Republic
+Laos|LA|LAO|Lao,Laotian|ລາວ,Lao PDR
+Latvia|LV|LVA|Latvian,Lett|Latvija
+Lebanon|LB|LBN|Lebanese|لبنان,Lubnan,Liban
+Lesotho|LS|LSO|Basotho,Mosotho|
+Liberia|LR|LBR|Liberian|
+Libya|LY|LBY|Libyan|ليبيا,Lybia
+Liechtenstein|LI|LIE|Liechtensteiner|
+Lithuania|LT|LTU|Lithuanian|Lietuva
+Luxembourg|LU|LUX|Luxembourgish,Luxembourger|Lëtzebuerg,Luxemburg
+Macau|MO|MAC|Macanese|澳門,Macao
+Madagascar|MG|MDG|Malagasy|Madagasikara
+Malawi|MW|MWI|Malawian|
+Malaysia|MY|MYS|Malaysian|Malaya
+Maldives|MV|MDV|Maldivian|ދިވެހިރާއްޖެ
+Mali|ML|MLI|Malian|
+Malta|MT|MLT|Maltese|
+Marshall Islands|MH|MHL|Marshallese|
+Mauritania|MR|MRT|Mauritanian|موريتانيا
+Mauritius|MU|MUS|Mauritian|Maurice
+Mexico|MX|MEX|Mexican|México,Mejico,Mexiko
+Micronesia|FM|FSM|Micronesian|Federated States of Micronesia
+Moldova|MD|MDA|Moldovan|Moldavia
+Monaco|MC|MCO|Monegasque,Monacan|
+Mongolia|MN|MNG|Mongolian,Mongol|Монгол Улс,Mongol Uls
+Montenegro|ME|MNE|Montenegrin|Crna Gora
+Morocco|MA|MAR|Moroccan|المغرب,Maroc,Marocco,Morroco
+Mozambique|MZ|MOZ|Mozambican|Moçambique,Mocambique
+Myanmar|MM|MMR|Burmese,Myanma|မြန်မာ,Burma
+Namibia|NA|NAM|Namibian|
+Nauru|NR|NRU|Nauruan|
+Nepal|NP|NPL|Nepali,Nepalese|नेपाल
+Netherlands|NL|NLD|Dutch,Netherlander|Nederland,Holland,The Netherlands,Netherland
+New Zealand|NZ|NZL|New Zealander,Kiwi|Aotearoa,Newzealand
+Nicaragua|NI|NIC|Nicaraguan|
+Niger|NE|NER|Nigerien|
+Nigeria|NG|NGA|Nigerian|Naija
+North Korea|KP|PRK|North Korean|조선,Chosŏn,DPRK,Democratic People's Republic of Korea
+North Macedonia|MK|MKD|Macedonian|Macedonia,Северна Македонија
+Norway|NO|NOR|Norwegian|Norge,Noreg,Norwey
+Oman|OM|OMN|Omani|عُمان
+Pakistan|PK|PAK|Pakistani|پاکستان,Pakstan
+Palau|PW|PLW|Palauan|
+Palestine|PS|PSE|Palestinian|فلسطين,State of Palestine,Palestinian Territories
+Panama|PA|PAN|Panamanian|Panamá
+Papua New Guinea|PG|PNG|Papua New Guinean,Papuan|
+Paraguay|PY|PRY|Paraguayan|
+Peru|PE|PER|Peruvian|Perú
+Philippines|PH|PHL|Filipino,Filipina,Philippine|Pilipinas,Filipinas,Phillipines,Philipines
+Poland|PL|POL|Polish,Pole|Polska,Pologne
+Portugal|PT|PRT|Portuguese|Portugul
+Qatar|QA|QAT|Qatari|قطر
+Romania|RO|ROU|Romanian|România,Rumania,Roumania
+Russia|RU|RUS|Russian|Россия,Rossiya,Russian Federation,Rusia,Russland
+Rwanda|RW|RWA|Rwandan,Rwandese|
+Saint Kitts and Nevis|KN|KNA|Kittitian,Nevisian|St Kitts and Nevis
+Saint Lucia|LC|LCA|Saint Lucian|St Lucia
+Saint Vincent and the Grenadines|VC|VCT|Vincentian|St Vincent
+Samoa|WS|WSM|Samoan|
+San Marino|SM|SMR|Sammarinese|
+Sao Tome and Principe|ST|STP|Santomean|São Tomé and Príncipe
+Saudi Arabia|SA|SAU|Saudi,Saudi Arabian|السعودية,KSA,Saudia Arabia
+Senegal|SN|SEN|Senegalese|Sénégal
+Serbia|RS|SRB|Serbian,Serb|Србија,Srbija
+Seychelles|SC|SYC|Seychellois|
+Sierra Leone|SL|SLE|Sierra Leonean|
+Singapore|SG|SGP|Singaporean|新加坡,Singapura,Singapur
+Slovakia|SK|SVK|Slovak,Slovakian|Slovensko
+Slovenia|SI|SVN|Slovenian,Slovene|Slovenija
+Solomon Islands|SB|SLB|Solomon Islander|
+Somalia|SO|SOM|Somali|Soomaaliya
+South Africa|ZA|ZAF|South African|RSA,Suid-Afrika,Mzansi
+South Korea|KR|KOR|Korean,South Korean|한국,대한민국,Hanguk,Korea,Republic of Korea,ROK
+South Sudan|SS|SSD|South Sudanese|
+Spain|ES|ESP|Spanish,Spaniard|España,Espana,Espagne,Spian
+Sri Lanka|LK|LKA|Sri Lankan|ශ්‍රී ලංකාව,இலங்கை,Ceylon,Srilanka
+Sudan|SD|SDN|Sudanese|السودان
+Suriname|SR|SUR|Surinamese|Surinam
+Sweden|SE|SWE|Swedish,Swede|Sverige,Sweeden
+Switzerland|CH|CHE|Swiss|Schweiz,Suisse,Svizzera,Helvetia,Switzerlnd
+Syria|SY|SYR|Syrian|سوريا,Syrian Arab Republic
+Taiwan|TW|TWN|Taiwanese|臺灣,台灣,台湾,Republic of China,ROC,Formosa
+Tajikistan|TJ|TJK|Tajik,Tajikistani|Тоҷикистон,Tadjikistan
+Tanzania|TZ|TZA|Tanzanian|Tanzania United Republic
+Thailand|TH|THA|Thai|ประเทศไทย,Prathet Thai,Siam,Tailand,Thialand
+Timor-Leste|TL|TLS|Timorese|East Timor
+Togo|TG|TGO|Togolese|
+Tonga|TO|TON|Tongan|
+Trinidad and Tobago|TT|TTO|Trinidadian,Tobagonian|
+Tunisia|TN|TUN|Tunisian|تونس,Tunisie
+Turkey|TR|TUR|Turkish,Turk|Türkiye,Turkiye,Turkei,Turky
+Turkmenistan|TM|TKM|Turkmen|Türkmenistan
+Tuvalu|TV|TUV|Tuvaluan|
+Uganda|UG|UGA|Ugandan|
+Ukraine|UA|UKR|Ukrainian|Україна,Ukraina,The Ukraine
+United Arab Emirates|AE|ARE|Emirati|الإمارات,UAE,Emirates
+United Kingdom|GB|GBR|British,Briton,Brit|UK,U.K.,Great Britain,Britain
+United States|US|USA|American|U.S.,U.S.A.,United States of America,America,Estados Unidos,Untied States
+Uruguay|UY|URY|Uruguayan|
+Uzbekistan|UZ|UZB|Uzbek,Uzbekistani|Oʻzbekiston,Ozbekiston
+Vanuatu|VU|VUT|Ni-Vanuatu|
+Vatican City|VA|VAT|Vatican|Holy See,Vatican
+Venezuela|VE|VEN|Venezuelan|
+Vietnam|VN|VNM|Vietnamese|Việt Nam,Viet Nam,Veitnam,Vietnamn
+Yemen|YE|YEM|Yemeni|اليمن
+Zambia|ZM|ZMB|Zambian|
+Zimbabwe|ZW|ZWE|Zimbabwean|Rhodesia
+"""
+
+# Typos shorter than this are not fuzzy-matched; short inputs collide too easily.
+_FUZZY_MIN_LENGTH = 4
+_FUZZY_CUTOFF = 0.84
+
+# Peoples, languages and regions that look like a country or demonym but are not one;
+# they are never fuzzy-matched ("Romani" is not Romania).
+_NOT_FUZZY = frozenset({
+    "romani", "romanis", "roma", "romany", "kurd", "kurdish", "kurds", "basque", "catalan", "tamil", "berber",
+    "amazigh", "maori", "sami", "inuit", "hmong", "yoruba", "igbo", "zulu", "xhosa", "tibetan",
+    "uyghur", "uighur", "bedouin", "pashtun", "punjabi", "bengali", "gujarati", "sindhi", "baloch",
+    "persian", "english", "scottish", "welsh", "scotland", "wales", "england", "flemish", "walloon",
+    "quebec", "quebecois", "hawaiian", "sikh", "druze", "assyrian", "cherokee", "navajo", "aboriginal",
+})
+
+
+def _normalize(text: str) -> str:
+    """Casefold, strip accents and punctuation, and collapse whitespace."""
+    s = unicodedata.normalize("NFKD", text or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).casefold()
+    s = re.sub(r"[^\w\s]", "", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    if s.startswith("the "):
+        s = s[4:]
+    return s
+
+
+def _build_index():
+    index, names = {}, []
+    for line in _CULTURE_DATA.strip().splitlines():
+        name, iso2, iso3, demonyms, aliases = (field.strip() for field in line.split("|"))
+        names.append(name)
+        for alias in [name, iso2, iso3] + demonyms.split(",") + aliases.split(","):
+            key = _normalize(alias)
+            # first entry wins for shared aliases (e.g. "Dominican", "Congolese")
+            if key and key not in index:
+                index[key] = name
+    return index, tuple(names)
+
+
+_ALIAS_INDEX, CANONICAL_CULTURES = _build_index()
+_FUZZY_KEYS = [k for k in _ALIAS_INDEX if len(k) >= _FUZZY_MIN_LENGTH]
+
+
+_DEMONYM_ENDINGS = ("i", "an", "ese", "ish", "ic")
+
+
+def _is_other_people(key: str, match: str) -> bool:
+    # An input that is already a demonym-shaped word and that a longer key merely
+    # extends ("romani" -> "romania", "romanian") names a different people, not a typo.
+    return key.endswith(_DEMONYM_ENDINGS) and match != key and match.startswith(key)
+
+
+@lru_cache(maxsize=4096)
+def canonicalize_culture(culture: str) -> str:
+    """Resolve free-form user input ("japanese", "JP", "日本", "Japn") to a canonical culture name.
+
+    Unknown inputs are returned stripped but otherwise unchanged, so regions and
+    cultures outside the index still work.
+    """
+    raw = (culture or "").strip()
+    key = _normalize(raw)
+    if not key:
+        return raw
+    if key in _ALIAS_INDEX:
+        return _ALIAS_INDEX[key]
+    # allow trailing words such as "Japan culture" or "Italian people"
+    for suffix in (" culture", " people", " customs", " etiquette"):
+        if key.endswith(suffix) and key[: -len(suffix)] in _ALIAS_INDEX:
+            return _ALIAS_INDEX[key[: -len(suffix)]]
+    if len(key) >= _FUZZY_MIN_LENGTH and key not in _NOT_FUZZY:
+        match = difflib.get_close_matches(key, _FUZZY_KEYS, n=1, cutoff=_FUZZY_CUTOFF)
+        if match and not _is_other_people(key, match[0]):
+            return _ALIAS_INDEX[match[0]]
+    return raw
+
+
+def culture_key(culture: str) -> str:
+    """Lower-cased canonical name, used to key caches."""
+    return canonicalize_culture(culture).strip().lower()
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FeedbackJobs:
+    """Background etiquette-feedback calls that clients collect later by id.
+
+    Lets /chat answer as soon as the persona reply is ready; the feedback keeps
+    generating on a worker thread and is fetched from /chat/feedback/{id}. Finished
+    and abandoned jobs are forgotten after `ttl_seconds`, and at most `max_jobs`
+    are remembered.
+    """
+
+    def __init__(self, max_workers: int = 8, ttl_seconds: float = 600, max_jobs: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feedback")
+        self._jobs = OrderedDict()  # id -> (created_at, Future), oldest first
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._jobs:
+            job_id, (created_at, _) = next(iter(self._jobs.items()))
+            if len(self._jobs) > self.max_jobs or now - created_at > self.ttl_seconds:
+                del self._jobs[job_id]
+            else:
+                break
+
+    def submit(self, fn, *args, **kwargs) -> str:
+        """Start `fn(*args, **kwargs)` in the background and return the job id."""
+        job_id = uuid.uuid4().hex
+        future = self._pool.submit(fn, *args, **kwargs)
+        now = time.monotonic()
+        with self._lock:
+            self._jobs[job_id] = (now, future)
+            self._evict(now)
+        return job_id
+
+    def future(self, job_id: str):
+        """The job's Future, or None if the id is unknown or expired."""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        return entry[1] if entry else None
+
+    def status(self, job_id: str):
+        """{"status": "pending"|"ready"|"error", ...} for a job, or None if unknown."""
+        future = self.future(job_id)
+        if future is None:
+            return None
+        if not future.done():
+            return {"id": job_id, "status": "pending"}
+        exc = future.exception()
+        if exc is not None:
+            return {"id": job_id, "status": "error", "detail": str(exc)}
+        return {"id": job_id, "status": "ready", "feedback": future.result()}
+
+
+_feedback_jobs = None
+_feedback_jobs_lock = threading.Lock()
+
+
+def get_feedback_jobs() -> FeedbackJobs:
+    """Return the process-wide feedback job registry, configured from the environment on first use."""
+    global _feedback_jobs
+    if _feedback_jobs is None:
+        with _feedback_jobs_lock:
+            if _feedback_jobs is None:
+                _feedback_jobs = FeedbackJobs(
+                    max_workers=int(os.getenv("FEEDBACK_WORKERS", "8")),
+                    ttl_seconds=float(os.getenv("FEEDBACK_JOB_TTL_SECONDS", "600")),
+                )
+    return _feedback_jobs
@@ -0,0 +1,213 @@
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app.metrics import Counter, Gauge
+
+LIMITER_WAITING = Gauge(
+    "culture_limiter_waiting_calls",
+    "Model calls queued in the process-wide limiter.",
+)
+LIMITER_REJECTED = Counter(
+    "culture_limiter_rejected_total",
+    "Model calls rejected by the limiter, by reason (queue_full, timeout or budget).",
+    ("reason",),
+)
+
+# The reservation model calls on this thread are paid from, if any (see GeminiLimiter.reserve).
+_reservation = contextvars.ContextVar("_reservation", default=None)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a model call cannot be admitted; `retry_after` is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class Reservation:
+    """Model calls paid for up front by `GeminiLimiter.reserve`.
+
+    Calls made inside `run` draw on it and skip the rate-limit wait (they still take
+    a concurrency slot); whatever is left when it is closed goes back to the bucket.
+    """
+
+    def __init__(self, limiter, calls: int, delay: float):
+        self.limiter = limiter
+        self.remaining = calls
+        # seconds to wait before starting, while the bucket catches up with the borrowed calls
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def give_back(self) -> None:
+        with self._lock:
+            self.remaining += 1
+
+    def run(self, fn, *args, **kwargs):
+        """Call `fn` with this reservation bound, so its model calls (and fan-out workers') use it."""
+        token = _reservation.set(self)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _reservation.reset(token)
+
+    def close(self) -> None:
+        with self._lock:
+            unused, self.remaining = self.remaining, 0
+        if unused:
+            self.limiter._refund(unused)
+
+
+class GeminiLimiter:
+    """Process-wide admission control for model calls.
+
+    Combines a concurrency cap with a requests-per-minute token bucket. Calls that
+    can't start immediately wait in a bounded queue for at most `max_wait_seconds`;
+    when the queue is already full, or the wait times out, `RateLimitExceeded` is
+    raised so the API can answer 429 with Retry-After instead of piling up work.
+    Thread-safe, so it also covers the Streamlit app and worker threads.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: float = 60, burst: int = None,
+                 max_queue: int = 64, max_wait_seconds: float = 30.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate = max(requests_per_minute, 1e-6) / 60.0  # tokens per second
+        self.capacity = float(burst if burst is not None else self.max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._tokens = self.capacity
+        self._refilled_at = time.monotonic()
+        self._active = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _retry_after(self) -> float:
+        # time for the bucket to cover everyone already queued, plus this caller
+        return max(1.0, (self._waiting + 1 - self._tokens) / self.rate)
+
+    @property
+    def saturated(self) -> bool:
+        """True when a new call would be rejected straight away because the queue is full."""
+        with self._cond:
+            return self._waiting >= self.max_queue and (self._active >= self.max_concurrency or self._tokens < 1)
+
+    def retry_after(self) -> int:
+        with self._cond:
+            return max(1, int(math.ceil(self._retry_after())))
+
+    def reserve(self, calls: int) -> Reservation:
+        """Pay for a request's `calls` model calls before it starts, or raise `RateLimitExceeded`.
+
+        Admission is all or nothing, so a multi-call request isn't cut off halfway by
+        the rate limit. The bucket may be borrowed against: the reservation's `delay`
+        is how long to hold off first, which async callers should sleep off on the
+        event loop rather than in a worker thread.
+        """
+        with self._cond:
+            self._refill(time.monotonic())
+            delay = max(0.0, calls - self._tokens) / self.rate if calls else 0.0
+            if delay > self.max_wait_seconds:
+                LIMITER_REJECTED.inc(reason="budget")
+                raise RateLimitExceeded(f"Not enough model capacity for {calls} calls", delay)
+            self._tokens -= calls
+        return Reservation(self, calls, delay)
+
+    def _refund(self, calls: int) -> None:
+        with self._cond:
+            self._tokens = min(self.capacity, self._tokens + calls)
+            self._cond.notify_all()
+
+    def acquire(self, prepaid: bool = False) -> None:
+        """Wait for a concurrency slot and, unless `prepaid` by a reservation, a rate-limit token."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._active < self.max_concurrency and (prepaid or self._tokens >= 1) and self._waiting == 0:
+                if not prepaid:
+                    self._tokens -= 1
+                self._active += 1
+                return
+            if self._waiting >= self.max_queue:
+                LIMITER_REJECTED.inc(reason="queue_full")
+                raise RateLimitExceeded("Model request queue is full", self._retry_after())
+
+            self._waiting += 1
+            LIMITER_WAITING.inc()
+            deadline = now + self.max_wait_seconds
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._active < self.max_concurrency and (prepaid or self._tokens >= 1):
+                        if not prepaid:
+                            self._tokens -= 1
+                        self._active += 1
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        LIMITER_REJECTED.inc(reason="timeout")
+                        raise RateLimitExceeded("Timed out waiting for model capacity", self._retry_after())
+                    wait = remaining
+                    if not prepaid and self._tokens < 1:
+                        wait = min(wait, (1 - self._tokens) / self.rate)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting -= 1
+                LIMITER_WAITING.dec()
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            # waiters differ (prepaid ones only need the slot), so let them all re-check
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        reservation = _reservation.get()
+        prepaid = reservation is not None and reservation.limiter is self and reservation.take()
+        try:
+            self.acquire(prepaid=prepaid)
+        except RateLimitExceeded:
+            if prepaid:
+                reservation.give_back()
+            raise
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> GeminiLimiter:
+    """Return the process-wide limiter, configured from the environment on first use."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                burst = os.getenv("GEMINI_BURST")
+                _limiter = GeminiLimiter(
+                    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+                    requests_per_minute=float(os.getenv("GEMINI_RPM", "60")),
+                    burst=int(burst) if burst else None,
+                    max_queue=int(os.getenv("GEMINI_MAX_QUEUE", "64")),
+                    max_wait_seconds=float(os.getenv("GEMINI_MAX_WAIT_SECONDS", "30")),
+                )
+    return _limiter
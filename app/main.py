@@ -1,18 +1,72 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import re
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from app.crew_wrapper import CultureCrew
+from app.agents import plan_sections, warm_up_model
+from app.feedback_jobs import get_feedback_jobs
+from app.limiter import RateLimitExceeded, get_limiter
+from app.pdf import PDF_MAX_TEXT_CHARS, PDF_SUPPORTED, pdf_key, submit_pdf
+from app.snapshot import load_default_snapshot
+from app import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """On startup, map the briefing snapshot and resolve the Gemini model in the background."""
+    load_default_snapshot()
+    warm_up_model()
+    yield
+
 
 app = FastAPI(
     title="AI Culture Companion API",
     description="API for cultural insights and persona-based chat",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 crew = CultureCrew()
 
 
+Verbosity = Literal["concise", "medium", "detailed"]
+# "custom" picks the sections to generate (see `sections`) at medium length
+SummaryVerbosity = Literal["concise", "medium", "detailed", "custom"]
+
+
 class SummaryRequest(BaseModel):
     culture: str
     username: str
+    verbosity: SummaryVerbosity = "medium"
+    # generate only these sections (summary, etiquette, communication_style, recommendations);
+    # the rest come back as null and are listed in "missing"
+    sections: Optional[List[str]] = None
+
+
+class SectionRequest(BaseModel):
+    culture: str
+    username: str
+    section: str
+    verbosity: SummaryVerbosity = "medium"
+
+
+class BatchSummaryItem(BaseModel):
+    culture: str
+    verbosity: Verbosity = "medium"
+
+
+class BatchSummaryRequest(BaseModel):
+    username: str
+    items: List[BatchSummaryItem]
+    max_parallel: Optional[int] = None
+
+
+# Upper bound on items per /summary/batch request.
+MAX_BATCH_ITEMS = 100
 
 
 class ChatRequest(BaseModel):
@@ -20,6 +74,86 @@ class ChatRequest(BaseModel):
     persona: str
     message: str
     username: str
+    verbosity: Verbosity = "medium"
+    # start a fresh conversation with this persona instead of continuing the last one
+    new_conversation: bool = False
+    # return the reply without waiting for feedback; collect it from /chat/feedback/{feedback_id}
+    defer_feedback: bool = False
+
+
+class PdfExportRequest(BaseModel):
+    title: str
+    text: str
+    filename: str = "export.pdf"
+
+
+def _retry_after(exc):
+    """Retry-After hint (seconds) if `exc` or its cause is a rate-limit or quota error, else None."""
+    while exc is not None:
+        if isinstance(exc, RateLimitExceeded):
+            return exc.retry_after
+        # google.api_core ResourceExhausted (HTTP 429) from the Gemini quota
+        if type(exc).__name__ == "ResourceExhausted" or getattr(exc, "code", None) == 429:
+            return get_limiter().retry_after()
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def _http_error(exc: Exception) -> HTTPException:
+    retry_after = _retry_after(exc)
+    if retry_after is not None:
+        return HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(retry_after)})
+    return HTTPException(status_code=500, detail=str(exc))
+
+
+def _check_sections(sections):
+    try:
+        plan_sections(sections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _reject_if_saturated():
+    """Answer 429 up front when the model queue is full, without tying up a worker thread."""
+    limiter = get_limiter()
+    if limiter.saturated:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests in flight; try again shortly.",
+            headers={"Retry-After": str(limiter.retry_after())},
+        )
+
+
+async def _reserve(reserve, *args, **kwargs):
+    """Reserve a request's model calls before any work starts; 429 if they don't fit.
+
+    When the rate limit is borrowed against, the wait happens here on the event loop
+    instead of in a worker thread.
+    """
+    try:
+        reservation = await run_in_threadpool(reserve, *args, **kwargs)
+    except Exception as e:
+        raise _http_error(e)
+    try:
+        await asyncio.sleep(reservation.delay)
+    except BaseException:
+        reservation.close()
+        raise
+    return reservation
+
+
+def _sse(events):
+    """Encode agent events as Server-Sent Events; errors become a final `error` event."""
+    try:
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        error = {"event": "error", "detail": str(e), "retry_after": _retry_after(e)}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n"
+
+
+# Disable proxy buffering so tokens reach the client as they are produced.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 
 @app.get("/")
@@ -28,25 +162,181 @@ def health_check():
     return {"status": "healthy", "service": "AI Culture Companion API"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics: upstream call latency, errors, in-flight calls and cache hits."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/summary")
-def get_summary(req: SummaryRequest):
+async def get_summary(req: SummaryRequest):
     """Generate a cultural summary with etiquette guidelines."""
+    _check_sections(req.sections)
+    _reject_if_saturated()
+    reservation = await _reserve(crew.reserve_summary, req.culture, req.verbosity, sections=req.sections)
     try:
-        return crew.generate_summary(req.culture, req.username)
+        return await run_in_threadpool(
+            reservation.run, crew.generate_summary_with_verbosity, req.culture, req.username,
+            verbosity=req.verbosity, sections=req.sections,
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _http_error(e)
+    finally:
+        reservation.close()
+
+
+@app.post("/summary/section")
+async def get_summary_section(req: SectionRequest):
+    """Fill in one section left out of an earlier summary (served from cache when possible)."""
+    _check_sections([req.section])
+    _reject_if_saturated()
+    reservation = await _reserve(crew.reserve_section, req.culture, req.section, verbosity=req.verbosity)
+    try:
+        text = await run_in_threadpool(
+            reservation.run, crew.fill_summary_section, req.culture, req.username, req.section,
+            verbosity=req.verbosity,
+        )
+    except Exception as e:
+        raise _http_error(e)
+    finally:
+        reservation.close()
+    return {"section": req.section, "text": text}
+
+
+@app.post("/summary/stream")
+async def stream_summary(req: SummaryRequest):
+    """Stream a cultural summary as Server-Sent Events (delta, section, done)."""
+    _check_sections(req.sections)
+    _reject_if_saturated()
+    events = crew.stream_summary_with_verbosity(req.culture, req.username, verbosity=req.verbosity,
+                                                sections=req.sections)
+    return StreamingResponse(_sse(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/summary/batch")
+async def get_summary_batch(req: BatchSummaryRequest):
+    """Generate summaries for many cultures at once; per-item results or errors, in input order.
+
+    Each uncached item reserves its model calls before it starts, so an item that
+    can't be admitted fails on its own instead of partway through.
+    """
+    if not req.items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+    if req.max_parallel is not None and req.max_parallel < 1:
+        raise HTTPException(status_code=400, detail="max_parallel must be at least 1")
+    _reject_if_saturated()
+    results = await run_in_threadpool(
+        crew.generate_summaries_batch,
+        [(item.culture, item.verbosity) for item in req.items],
+        req.username,
+        max_parallel=req.max_parallel,
+    )
+    return {"results": results}
 
 
 @app.post("/chat")
-def chat_persona(req: ChatRequest):
+async def chat_persona(req: ChatRequest):
     """Chat with a cultural persona and get etiquette feedback."""
+    _reject_if_saturated()
+    reservation = await _reserve(crew.reserve_chat, defer_feedback=req.defer_feedback)
     try:
-        return crew.chat_as_culture(req.culture, req.persona, req.message, req.username)
+        return await run_in_threadpool(
+            reservation.run, crew.chat_as_culture_with_verbosity, req.culture, req.persona, req.message,
+            req.username, verbosity=req.verbosity, new_conversation=req.new_conversation,
+            defer_feedback=req.defer_feedback,
+        )
+    except Exception as e:
+        raise _http_error(e)
+    finally:
+        reservation.close()
+
+
+@app.get("/chat/feedback/{feedback_id}")
+async def get_chat_feedback(feedback_id: str, wait: float = Query(0, ge=0, le=30)):
+    """Deferred etiquette feedback for a /chat reply.
+
+    Returns {"status": "pending"}, {"status": "ready", "feedback": ...} or
+    {"status": "error", ...}. With `wait`, holds the request open for up to that many
+    seconds until the feedback is ready.
+    """
+    future = get_feedback_jobs().future(feedback_id)
+    if future is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired feedback id")
+    if wait and not future.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=wait)
+        except Exception:
+            pass  # still pending, or failed; reported below
+    return crew.get_feedback(feedback_id)
+
+
+@app.post("/chat/stream")
+async def stream_chat(req: ChatRequest):
+    """Stream a persona reply as Server-Sent Events, followed by etiquette feedback."""
+    _reject_if_saturated()
+    events = crew.stream_chat_as_culture(req.culture, req.persona, req.message, req.username,
+                                         verbosity=req.verbosity, new_conversation=req.new_conversation)
+    return StreamingResponse(_sse(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.get("/chat/session")
+def get_chat_session(username: str, culture: str, persona: str):
+    """The conversation so far with a persona: rolling summary plus recent turns."""
+    return crew.get_conversation(username, culture, persona)
+
+
+@app.delete("/chat/session")
+def reset_chat_session(username: str, culture: str, persona: str):
+    """Forget the conversation with a persona."""
+    crew.reset_conversation(username, culture, persona)
+    return {"status": "ok"}
+
+
+@app.get("/search")
+def search(q: str = Query(..., min_length=1), username: Optional[str] = None, culture: Optional[str] = None,
+           kind: Optional[Literal["note", "briefing"]] = None, limit: int = Query(20, ge=1, le=100)):
+    """Ranked full-text search over saved notes and generated briefings.
+
+    Words are all required, "quoted text" matches a phrase and `word*` a prefix.
+    Notes are searched only with `username`, and only that user's; briefings are shared.
+    """
+    return {"results": crew.search(q, username=username, culture=culture, kind=kind, limit=limit)}
+
+
+@app.post("/export/pdf")
+async def export_pdf(req: PdfExportRequest):
+    """Render `text` as a PDF; identical title and text are served from the content-addressed cache."""
+    if not PDF_SUPPORTED:
+        raise HTTPException(status_code=501, detail="PDF export requires reportlab")
+    if len(req.text) > PDF_MAX_TEXT_CHARS or len(req.title) > 500:
+        raise HTTPException(status_code=413, detail=f"Text is limited to {PDF_MAX_TEXT_CHARS} characters "
+                                                    "and the title to 500")
+    try:
+        data = await asyncio.wrap_future(submit_pdf(req.title, req.text))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    filename = re.sub(r"[^A-Za-z0-9._-]", "_", req.filename)
+    return Response(data, media_type="application/pdf", headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "ETag": f'"{pdf_key(req.title, req.text)}"',
+    })
 
 
 @app.get("/notes/{username}")
-def get_user_notes(username: str):
-    """Retrieve all saved notes for a user."""
-    return {"notes": crew.get_notes(username)}
+def get_user_notes(username: str, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                   culture: Optional[str] = None):
+    """Retrieve a page of a user's saved notes; pass `next_cursor` back as `cursor` for the next page."""
+    try:
+        return crew.get_notes(username, limit=limit, cursor=cursor, culture=culture)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/notes/{username}/export")
+def export_user_notes(username: str, culture: Optional[str] = None):
+    """Stream all of a user's saved notes as newline-delimited JSON."""
+    notes = crew.iter_notes(username, culture=culture)
+    lines = (json.dumps(n, ensure_ascii=False) + "\n" for n in notes)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
@@ -0,0 +1,171 @@
+"""Minimal Prometheus-style metrics: counters, gauges and histograms with labels.
+
+Rendered in the Prometheus text exposition format by `render()` (served on
+`/metrics` in app/main.py). Values are per process; Prometheus aggregates workers.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers cache-speed calls through slow multi-second generations.
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _render_samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _render_samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # [per-bucket counts, sum, count]
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_samples(self):
+        lines = []
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, n) in items:
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': bound})} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': '+Inf'})} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# --- application metrics ------------------------------------------------------
+# `kind` is one of: summary, etiquette, comm, tips, mistakes, top-up, structured,
+# persona, feedback, compact, continue, search.
+
+UPSTREAM_LATENCY = Histogram(
+    "culture_upstream_call_duration_seconds",
+    "Latency of Gemini and Custom Search calls.",
+    ("kind",),
+)
+UPSTREAM_ERRORS = Counter(
+    "culture_upstream_call_errors_total",
+    "Gemini and Custom Search calls that raised.",
+    ("kind",),
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "culture_upstream_calls_in_flight",
+    "Gemini and Custom Search calls currently in progress.",
+    ("kind",),
+)
+CACHE_REQUESTS = Counter(
+    "culture_briefing_cache_requests_total",
+    "Briefing cache lookups by result (hit or miss).",
+    ("result",),
+)
+FEEDBACK_CACHE_REQUESTS = Counter(
+    "culture_feedback_cache_requests_total",
+    "Etiquette feedback lookups by result (exact, near or miss).",
+    ("result",),
+)
+RESPONSE_CACHE_REQUESTS = Counter(
+    "culture_response_cache_requests_total",
+    "Per-message response cache (feedback, follow-up answers) lookups by result (hit or miss).",
+    ("result",),
+)
+SEARCH_CACHE_REQUESTS = Counter(
+    "culture_search_cache_requests_total",
+    "Related-resources cache lookups by result (hit or miss).",
+    ("result",),
+)
+
+
+@contextmanager
+def track_call(kind: str):
+    """Time an upstream call, count it as in flight while it runs, and count errors."""
+    UPSTREAM_IN_FLIGHT.inc(kind=kind)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.inc(kind=kind)
+        raise
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - started, kind=kind)
+        UPSTREAM_IN_FLIGHT.dec(kind=kind)
@@ -0,0 +1,134 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(created_at: str, note_id: int) -> str:
+    raw = json.dumps([created_at, note_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, note_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(created_at), int(note_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid notes cursor: {cursor!r}") from e
+
+
+class NotesStore:
+    """Append-only saved-notes store in SQLite (WAL mode), shared by every process on the host.
+
+    Notes are indexed by (username, created_at) and (username, culture, created_at)
+    and read in pages with an opaque keyset cursor, so listing a heavy user's notes
+    never loads them all at once. Notes come back oldest first, in the order saved.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared across threads; keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS notes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " username TEXT NOT NULL,"
+                " culture TEXT NOT NULL,"
+                " title TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " created_at TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS notes_user_created ON notes (username, created_at, id)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS notes_user_culture_created ON notes (username, culture, created_at, id)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    @property
+    def store_id(self) -> str:
+        """Random id of this notes database, fixed at creation; note ids are only unique within it."""
+        if getattr(self, "_store_id", None) is None:
+            conn = self._connect()
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+            self._store_id = conn.execute("SELECT value FROM meta WHERE key = 'store_id'").fetchone()[0]
+        return self._store_id
+
+    def add(self, username: str, culture: str, title: str, content: str, created_at: str) -> int:
+        """Append a note and return its id."""
+        cur = self._connect().execute(
+            "INSERT INTO notes (username, culture, title, content, created_at) VALUES (?, ?, ?, ?, ?)",
+            (username, culture, title, content, created_at),
+        )
+        return cur.lastrowid
+
+    def page(self, username: str, limit: int = 50, cursor: str = None, culture: str = None):
+        """Return (notes, next_cursor); next_cursor is None on the last page."""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sql = "SELECT id, title, culture, content, created_at FROM notes WHERE username = ?"
+        params = [username]
+        if culture:
+            sql += " AND culture = ?"
+            params.append(culture)
+        if cursor:
+            created_at, note_id = _decode_cursor(cursor)
+            sql += " AND (created_at > ? OR (created_at = ? AND id > ?))"
+            params.extend([created_at, created_at, note_id])
+        sql += " ORDER BY created_at, id LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._connect().execute(sql, params).fetchall()
+        notes = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = notes[-1]
+            next_cursor = _encode_cursor(last["created_at"], last["id"])
+        return notes, next_cursor
+
+    def latest(self, username: str):
+        """Return (created_at, id) of the user's newest note, or None; a cheap change marker."""
+        row = self._connect().execute(
+            "SELECT created_at, id FROM notes WHERE username = ? ORDER BY created_at DESC, id DESC LIMIT 1",
+            (username,),
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def iter_notes(self, username: str, culture: str = None, batch_size: int = MAX_PAGE_SIZE):
+        """Yield every note for `username`, reading one page at a time."""
+        cursor = None
+        while True:
+            notes, cursor = self.page(username, limit=batch_size, cursor=cursor, culture=culture)
+            yield from notes
+            if cursor is None:
+                return
+
+
+_notes_store = None
+_notes_store_lock = threading.Lock()
+
+
+def get_notes_store() -> NotesStore:
+    """Return the process-wide notes store, configured from the environment on first use."""
+    global _notes_store
+    if _notes_store is None:
+        with _notes_store_lock:
+            if _notes_store is None:
+                _notes_store = NotesStore(os.getenv("NOTES_DB_PATH", os.path.join("data", "notes.sqlite3")))
+    return _notes_store
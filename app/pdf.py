@@ -0,0 +1,160 @@
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+# Checked without importing reportlab; the import itself is deferred to the first export.
+PDF_SUPPORTED = importlib.util.find_spec("reportlab") is not None
+
+
+def make_pdf_bytes(title: str, text: str) -> bytes:
+    """Return nicely formatted PDF bytes using reportlab.platypus."""
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.pagesizes import letter
+
+    bio = io.BytesIO()
+    doc = SimpleDocTemplate(bio, pagesize=letter, title=title)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Title
+    # Paragraph parses its text as markup, so <, > and & must be escaped
+    story.append(Paragraph(escape(title), styles["Title"]))
+    story.append(Spacer(1, 12))
+
+    # If the text contains markdown-style headings, keep them as headings.
+    for line in text.splitlines():
+        s = line.strip()
+        if not s:
+            story.append(Spacer(1, 6))
+            continue
+        # heading-like line
+        if s.endswith(":") or s.isupper() or s.startswith("# ") or s.startswith("## "):
+            heading = s.replace("#", "").strip()
+            story.append(Paragraph(escape(heading), styles["Heading3"]))
+        else:
+            # simple body text
+            story.append(Paragraph(escape(s), styles["BodyText"]))
+        story.append(Spacer(1, 6))
+
+    doc.build(story)
+    bio.seek(0)
+    return bio.read()
+
+
+# --- cached, off-thread rendering ----------------------------------------------
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(".cache", "pdf"))
+PDF_MEMORY_ENTRIES = int(os.getenv("PDF_MEMORY_ENTRIES", "32"))
+# Oldest cached files are deleted once the cache directory grows past this size.
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Longest text /export/pdf accepts from clients; a full detailed briefing is well under this.
+PDF_MAX_TEXT_CHARS = int(os.getenv("PDF_MAX_TEXT_CHARS", "100000"))
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("PDF_WORKERS", "2")), thread_name_prefix="pdf")
+_memory = OrderedDict()  # key -> bytes, least recently used first
+_pending = {}  # key -> Future for renders in progress
+_lock = threading.Lock()
+
+
+def pdf_key(title: str, text: str) -> str:
+    """Content address of the PDF for `title` and `text`."""
+    return hashlib.sha256(json.dumps([title, text]).encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, data: bytes) -> None:
+    with _lock:
+        _memory[key] = data
+        _memory.move_to_end(key)
+        while len(_memory) > PDF_MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _cached(key: str):
+    with _lock:
+        data = _memory.get(key)
+        if data is not None:
+            _memory.move_to_end(key)
+            return data
+    path = os.path.join(PDF_CACHE_DIR, f"{key}.pdf")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        # the modification time orders eviction, so a hit marks the file as recently used
+        os.utime(path)
+    except OSError:
+        return None
+    _remember(key, data)
+    return data
+
+
+def _prune_disk_cache() -> None:
+    """Delete the least recently used PDFs until the cache directory fits PDF_CACHE_MAX_BYTES."""
+    try:
+        entries = []
+        with os.scandir(PDF_CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(".pdf"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= PDF_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _render(key: str, title: str, text: str) -> bytes:
+    try:
+        data = make_pdf_bytes(title, text)
+        try:
+            os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+            tmp_path = os.path.join(PDF_CACHE_DIR, f"{key}.pdf.{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(PDF_CACHE_DIR, f"{key}.pdf"))
+            _prune_disk_cache()
+        except OSError as e:
+            print(f"PDF cache write failed: {e}")
+        _remember(key, data)
+        return data
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+
+def submit_pdf(title: str, text: str) -> Future:
+    """Return a Future for the PDF bytes of `title` and `text`.
+
+    Rendered documents are cached in memory and on disk by content hash, so the same
+    export is only built once; renders run on a small worker pool, and concurrent
+    requests for the same document share one render.
+    """
+    key = pdf_key(title, text)
+    data = _cached(key)
+    if data is not None:
+        future = Future()
+        future.set_result(data)
+        return future
+    with _lock:
+        future = _pending.get(key)
+        if future is None:
+            future = _pending[key] = _pool.submit(_render, key, title, text)
+    return future
+
+
+def get_pdf_bytes(title: str, text: str, timeout: float = None) -> bytes:
+    """Blocking form of `submit_pdf`."""
+    return submit_pdf(title, text).result(timeout=timeout)
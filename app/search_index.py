@@ -0,0 +1,167 @@
+import os
+import re
+import sqlite3
+import threading
+
+MAX_RESULTS = 100
+
+_PHRASE = re.compile(r'"([^"]*)"')
+_WORD = re.compile(r"\w+\*?", re.UNICODE)
+
+
+def to_fts_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query.
+
+    "Quoted text" becomes a phrase, every other word a required term, and a trailing
+    `*` keeps prefix matching (`bow*`). FTS5 operators and punctuation in the input
+    are treated as plain text, so user queries can never be a syntax error.
+    """
+    parts = []
+    for phrase in _PHRASE.findall(query):
+        words = _WORD.findall(phrase.replace("*", ""))
+        if words:
+            parts.append('"' + " ".join(words) + '"')
+    for word in _WORD.findall(_PHRASE.sub(" ", query)):
+        if word.endswith("*"):
+            parts.append(f'"{word[:-1]}"*')
+        else:
+            parts.append(f'"{word}"')
+    return " ".join(parts)
+
+
+class SearchIndex:
+    """Incremental full-text index over saved notes and generated briefings.
+
+    Documents live in a SQLite table mirrored into an FTS5 index by triggers, so
+    each note or briefing is indexed as it is written and queries are ranked by
+    BM25 without scanning everything. Notes belong to a user; briefings are shared
+    and visible to everyone. Re-indexing a briefing replaces the previous text.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shared across threads; keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    doc_key TEXT NOT NULL UNIQUE,
+                    kind TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    culture TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS documents_user_culture ON documents (username, culture);
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                    title, body, content='documents', content_rowid='id', tokenize='unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+                    INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+                    INSERT INTO documents_fts (documents_fts, rowid, title, body)
+                    VALUES ('delete', old.id, old.title, old.body);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+                    INSERT INTO documents_fts (documents_fts, rowid, title, body)
+                    VALUES ('delete', old.id, old.title, old.body);
+                    INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+                END;
+                """
+            )
+            self._local.conn = conn
+        return conn
+
+    def _upsert(self, doc_key, kind, username, culture, title, body, created_at) -> None:
+        # unchanged documents are left alone, so re-indexing a cached briefing costs no FTS work
+        self._connect().execute(
+            "INSERT INTO documents (doc_key, kind, username, culture, title, body, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (doc_key) DO UPDATE SET title = excluded.title, body = excluded.body,"
+            " created_at = excluded.created_at"
+            " WHERE documents.title != excluded.title OR documents.body != excluded.body",
+            (doc_key, kind, username, culture, title, body, created_at),
+        )
+
+    def index_note(self, note_id: int, username: str, culture: str, title: str, content: str, created_at: str,
+                   store_id: str = "") -> None:
+        # note ids are per notes database; the store id keeps two databases from sharing keys
+        self._upsert(f"note|{store_id}|{note_id}", "note", username, culture, title, content, created_at)
+
+    def index_briefing(self, culture: str, verbosity: str, summary: dict, created_at: str) -> None:
+        body = "\n\n".join(
+            str(summary.get(field) or "")
+            for field in ("summary", "etiquette", "communication_style", "recommendations")
+        ).strip()
+        if body:
+            title = f"{culture} — Cultural Briefing ({verbosity})"
+            self._upsert(f"briefing|{culture.lower()}|{verbosity}", "briefing", "", culture, title, body, created_at)
+
+    def search(self, query: str, username: str = None, culture: str = None, kind: str = None,
+               limit: int = 20) -> list:
+        """Return documents matching `query`, best first.
+
+        Notes are private: they are searched only with a `username`, and only that
+        user's; without one only the shared briefings are searched. `culture` and
+        `kind` ("note" or "briefing") narrow further.
+        """
+        match = to_fts_query(query or "")
+        if not match or (username is None and kind == "note"):
+            return []
+        sql = (
+            "SELECT d.kind, d.doc_key, d.username, d.culture, d.title, d.created_at,"
+            " snippet(documents_fts, 1, '**', '**', '…', 16) AS snippet, bm25(documents_fts) AS rank"
+            " FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+            " WHERE documents_fts MATCH ?"
+        )
+        params = [match]
+        if username is None:
+            sql += " AND d.kind = 'briefing'"
+        else:
+            sql += " AND (d.username = ? OR d.kind = 'briefing')"
+            params.append(username)
+        if culture:
+            sql += " AND d.culture = ?"
+            params.append(culture)
+        if kind:
+            sql += " AND d.kind = ?"
+            params.append(kind)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(max(1, min(int(limit), MAX_RESULTS)))
+
+        results = []
+        for row in self._connect().execute(sql, params):
+            result = dict(row)
+            doc_key = result.pop("doc_key")
+            if result["kind"] == "note":
+                result["note_id"] = int(doc_key.rsplit("|", 1)[1])
+            results.append(result)
+        return results
+
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Return the process-wide search index, configured from the environment on first use."""
+    global _search_index
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                _search_index = SearchIndex(os.getenv("SEARCH_INDEX_PATH", os.path.join("data", "search.sqlite3")))
+    return _search_index
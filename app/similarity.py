@@ -0,0 +1,146 @@
+"""Lexical near-duplicate detection for short texts (chat messages, questions).
+
+Texts are normalized, split into overlapping character shingles and summarized by
+a MinHash signature; locality-sensitive hashing over signature bands finds
+candidates in roughly constant time, and candidates are confirmed with the exact
+Jaccard similarity of their shingle sets. Because one changed word barely moves
+that similarity ("bring wine" / "not bring wine"), a match must also have the same
+content words: texts may differ only in stopwords, punctuation, case and spacing.
+"""
+import hashlib
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+_NON_WORD = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+# (a, b) pairs for the universal hash family h(x) = (a * x + b) mod p; fixed so
+# signatures are identical across processes and restarts.
+_PRIME = (1 << 61) - 1
+_NUM_PERM = 64
+_BANDS = 16
+_ROWS = _NUM_PERM // _BANDS
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.sha256(f"a{i}".encode()).digest()[:8], "little") % (_PRIME - 1) + 1,
+     int.from_bytes(hashlib.sha256(f"b{i}".encode()).digest()[:8], "little") % _PRIME)
+    for i in range(_NUM_PERM)
+]
+
+
+# Function words whose presence doesn't change what a message asks or says. Negations
+# (no, not, never, don't -> "don t", ...) are deliberately absent: they are content.
+STOPWORDS = frozenset("""
+a an the this that these those some any each every
+i me my we us our you your he him his she her it its they them their
+is am are was were be been being do does did have has had will would shall should can could may might must
+to of in on at by for with from about into onto over as than then so just also very really quite
+and or but if while when where how what which who whom whose why
+please hi hello hey thanks thank ok okay um uh oh well
+""".split())
+
+
+def content_words(text: str) -> tuple:
+    """Normalized words of `text` minus stopwords, in order."""
+    return tuple(w for w in normalize_text(text).split() if w not in STOPWORDS)
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", (text or "").lower())).strip()
+
+
+def fingerprint(text: str) -> str:
+    """Stable fingerprint of the normalized text; equal for trivially different spellings."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, k: int = 4) -> frozenset:
+    """Character k-grams of the normalized text (the whole text if shorter than k)."""
+    s = normalize_text(text)
+    if len(s) <= k:
+        return frozenset([s]) if s else frozenset()
+    return frozenset(s[i:i + k] for i in range(len(s) - k + 1))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingle_set: frozenset) -> tuple:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set] or [0]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+class NearDuplicateIndex:
+    """Bounded, thread-safe map from texts to values with near-duplicate lookup.
+
+    `lookup` returns the value stored for the most similar text whose shingle
+    Jaccard similarity is at least `threshold` and whose content words are the
+    same. At most `max_entries` texts are kept; the least recently used are evicted.
+    """
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 5000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # fingerprint -> (shingles, bands, value, content words)
+        self._buckets = {}  # (band index, band hash) -> set of fingerprints
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bands(signature: tuple) -> list:
+        return [(i, hash(signature[i * _ROWS:(i + 1) * _ROWS])) for i in range(_BANDS)]
+
+    def add(self, text: str, value) -> None:
+        key = fingerprint(text)
+        shingle_set = shingles(text)
+        bands = self._bands(minhash(shingle_set))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (shingle_set, bands, value, content_words(text))
+            for band in bands:
+                self._buckets.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, bands, _, _ = self._entries.pop(key)
+        for band in bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def lookup(self, text: str):
+        """Return (value, similarity) for the closest stored text, or None below the threshold."""
+        key = fingerprint(text)
+        shingle_set = shingles(text)
+        bands = self._bands(minhash(shingle_set))
+        words = content_words(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[2], 1.0
+            candidates = set()
+            for band in bands:
+                candidates |= self._buckets.get(band, set())
+            best, best_score = None, self.threshold
+            for candidate in candidates:
+                if self._entries[candidate][3] != words:
+                    continue
+                score = jaccard(shingle_set, self._entries[candidate][0])
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            return self._entries[best][2], best_score
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,73 @@
+import copy
+import threading
+
+from app.metrics import Counter
+
+COALESCED = Counter(
+    "culture_coalesced_requests_total",
+    "Requests that waited on an identical in-flight computation instead of starting their own.",
+    ("kind",),
+)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one computation.
+
+    The first caller for a key runs `fn`; callers arriving while it is in flight wait
+    for it and receive a deep copy of its result (or its exception), so nobody can
+    mutate another caller's data. Nothing is cached once the call completes; that is
+    the briefing cache's job.
+    """
+
+    def __init__(self, kind: str = "default"):
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def begin(self, key):
+        """Register interest in `key`; returns (call, leader).
+
+        For callers that can't express their work as one function (streams): the
+        leader must eventually call `finish`, followers call `wait`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            COALESCED.inc(kind=self.kind)
+        return call, leader
+
+    def finish(self, key, call, result=None, error=None) -> None:
+        call.result, call.error = result, error
+        with self._lock:
+            del self._calls[key]
+        call.done.set()
+
+    @staticmethod
+    def wait(call):
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def do(self, key, fn):
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result
@@ -0,0 +1,134 @@
+"""Versioned, memory-mapped snapshot of pre-generated briefings.
+
+Layout (all integers little-endian):
+
+    magic    8 bytes   b"CCSNAP\\0\\0"
+    version  uint16
+    hdr_len  uint32    length of the JSON header that follows
+    header   JSON      {"meta": {...}, "index": {"<culture>|<verbosity>": [offset, length], ...}}
+    data     ...       zlib-compressed JSON summaries; offsets are relative to the data start
+
+The file is written by scripts/pregenerate_briefings.py and memory-mapped at startup,
+so workers share the OS page cache and only the entries actually requested are
+decompressed.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+MAGIC = b"CCSNAP\0\0"
+SNAPSHOT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sHI")
+
+
+def _entry_key(culture: str, verbosity: str) -> str:
+    return f"{culture.strip().lower()}|{verbosity}"
+
+
+def write_snapshot(path: str, entries: dict, meta: dict = None) -> int:
+    """Write {(culture, verbosity): summary_dict} to `path` atomically; returns the entry count."""
+    index, blobs, offset = {}, [], 0
+    for (culture, verbosity), summary in sorted(entries.items()):
+        blob = zlib.compress(json.dumps(summary, ensure_ascii=False).encode("utf-8"), 6)
+        index[_entry_key(culture, verbosity)] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps({"meta": meta or {}, "index": index}, ensure_ascii=False).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return len(index)
+
+
+class BriefingSnapshot:
+    """Read-only view over a snapshot file; `get` decompresses one entry on demand."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, header_len = _PREAMBLE.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a briefing snapshot")
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(f"{path} has snapshot version {version}; expected {SNAPSHOT_VERSION}")
+            header_start = _PREAMBLE.size
+            header = json.loads(self._mm[header_start:header_start + header_len].decode("utf-8"))
+        except Exception:
+            self._file.close()
+            raise
+        self.meta = header.get("meta", {})
+        self._index = header.get("index", {})
+        self._data_start = header_start + header_len
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, item) -> bool:
+        culture, verbosity = item
+        return _entry_key(culture, verbosity) in self._index
+
+    def get(self, culture: str, verbosity: str = "medium"):
+        """Return a fresh copy of the stored summary dict, or None if absent."""
+        location = self._index.get(_entry_key(culture, verbosity))
+        if location is None:
+            return None
+        offset, length = location
+        start = self._data_start + offset
+        return json.loads(zlib.decompress(self._mm[start:start + length]).decode("utf-8"))
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def load_snapshot(path: str):
+    """Memory-map the snapshot at `path` as the process-wide snapshot; returns it or None.
+
+    Missing or unreadable snapshots are logged and ignored, so the app falls back to
+    the cache and the model. Loading the same path twice is a no-op.
+    """
+    global _snapshot
+    if not path:
+        return None
+    with _snapshot_lock:
+        if _snapshot is not None and _snapshot.path == path:
+            return _snapshot
+        if not os.path.exists(path):
+            print(f"Briefing snapshot not found at {path}; serving from cache and model only.")
+            return None
+        try:
+            snapshot = BriefingSnapshot(path)
+        except (OSError, ValueError) as e:
+            print(f"Could not load briefing snapshot {path}: {e}")
+            return None
+        previous, _snapshot = _snapshot, snapshot
+    if previous is not None:
+        previous.close()
+    print(f"Loaded briefing snapshot {path} ({len(snapshot)} briefings).")
+    return snapshot
+
+
+def load_default_snapshot():
+    """Load the snapshot named by $BRIEFING_SNAPSHOT_PATH, if any."""
+    return load_snapshot(os.getenv("BRIEFING_SNAPSHOT_PATH", ""))
+
+
+def get_snapshot():
+    """The process-wide snapshot, or None if none is loaded."""
+    return _snapshot
@@ -1,8 +1,11 @@
 from datetime import datetime
 from dotenv import load_dotenv
 import os
+import threading
 import requests
 
+from app.metrics import track_call
+
 
 def load_dotenv_safe():
     try:
@@ -15,6 +18,44 @@ def now_iso():
     return datetime.utcnow().isoformat() + "Z"
 
 
+SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+# (connect, read) seconds; a slow search must not hold up the summary page
+SEARCH_TIMEOUT = (
+    float(os.getenv("SEARCH_CONNECT_TIMEOUT_SECONDS", "3")),
+    float(os.getenv("SEARCH_READ_TIMEOUT_SECONDS", "10")),
+)
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", "3"))
+
+_search_session = None
+_search_session_lock = threading.Lock()
+
+
+def get_search_session() -> requests.Session:
+    """Return the shared Custom Search session.
+
+    Keeps connections to googleapis.com alive between calls, and retries 429 and
+    5xx responses with exponential backoff, honouring Retry-After.
+    """
+    global _search_session
+    if _search_session is None:
+        with _search_session_lock:
+            if _search_session is None:
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(
+                    total=SEARCH_MAX_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["GET"]),
+                    respect_retry_after_header=True,
+                )
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
+                _search_session = session
+    return _search_session
+
+
 def fetch_google_search_results(query, api_key, search_engine_id):
     """
     Fetch search results from Google Custom Search API.
@@ -27,7 +68,6 @@ def fetch_google_search_results(query, api_key, search_engine_id):
     Returns:
         list: A list of search result dictionaries with 'title' and 'url'.
     """
-    url = "https://www.googleapis.com/customsearch/v1"
     params = {
         "q": query,
         "key": api_key,
@@ -36,10 +76,10 @@ def fetch_google_search_results(query, api_key, search_engine_id):
     }
 
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
+        with track_call("search"):
+            response = get_search_session().get(SEARCH_URL, params=params, timeout=SEARCH_TIMEOUT)
+            response.raise_for_status()
         data = response.json()
-        print('Google Custom Search API response:', data)  # DEBUG LOG
         results = []
         for item in data.get("items", []):
             link = item.get("link")
@@ -56,3 +96,102 @@ def fetch_google_search_results(query, api_key, search_engine_id):
     except Exception as e:
         print(f"Error fetching search results: {e}")
         return []
+
+
+def looks_cutoff(text: str) -> bool:
+    """Heuristic: does `text` look like it was cut off mid-sentence?"""
+    if not text:
+        return False
+    s = text.strip()
+    if s.endswith("..."):
+        return True
+    if s[-1] not in ".!?\"'”’":
+        return len(s) > 80
+    return False
+
+
+# Overlaps shorter than this many characters only count when they are whole words.
+MIN_CHAR_OVERLAP = 21
+
+
+def _normalize_with_offsets(s: str):
+    """Lower-case `s` and collapse whitespace runs to one space, stripping the ends.
+
+    Returns (normalized, offsets) where offsets[i] is the index in `s` of the
+    character that became normalized[i].
+    """
+    chars, offsets = [], []
+    pending_space = False
+    for i, ch in enumerate(s):
+        if ch.isspace():
+            pending_space = bool(chars)
+            continue
+        if pending_space:
+            chars.append(" ")
+            offsets.append(i - 1)
+            pending_space = False
+        chars.append(ch.lower())
+        offsets.append(i)
+    return "".join(chars), offsets
+
+
+def _prefix_function(s: str) -> list:
+    """KMP failure table: pi[i] is the length of the longest proper border of s[:i + 1]."""
+    pi = [0] * len(s)
+    k = 0
+    for i in range(1, len(s)):
+        while k and s[i] != s[k]:
+            k = pi[k - 1]
+        if s[i] == s[k]:
+            k += 1
+        pi[i] = k
+    return pi
+
+
+def overlap_length(original: str, continuation: str) -> int:
+    """How many leading characters of `continuation` repeat the end of `original`.
+
+    Matching ignores case and whitespace differences. The longest overlap wins;
+    overlaps shorter than MIN_CHAR_OVERLAP characters must start and end on word
+    boundaries so a shared letter or two is not mistaken for a repeat. Runs in
+    O(len(original) + len(continuation)) using the KMP prefix function.
+    """
+    nb, b_offsets = _normalize_with_offsets(continuation)
+    # an overlap can't be longer than the continuation, so only the tail of original matters
+    na, _ = _normalize_with_offsets(original[-(len(continuation) + 1) * 2:])
+    # keep one extra character so a word boundary before the overlap can be checked
+    na = na[-(len(nb) + 1):] if nb else ""
+    if not na or not nb:
+        return 0
+
+    # borders of nb + sep + na that end at the last character are exactly the
+    # prefixes of nb that are also suffixes of na
+    pi = _prefix_function(nb + "\x00" + na)
+    k = pi[-1]
+    while k:
+        boundary_start = k == len(na) or na[-k - 1] == " "
+        boundary_end = k == len(nb) or nb[k] == " "
+        if k >= MIN_CHAR_OVERLAP or (boundary_start and boundary_end):
+            return b_offsets[k - 1] + 1
+        k = pi[k - 1]
+    return 0
+
+
+def merge_texts(original: str, continuation: str) -> str:
+    """Merge original + continuation, dropping the part of `continuation` that repeats the end of `original`.
+
+    See `overlap_length`; without an overlap the texts are joined with a space.
+    """
+    if not continuation:
+        return original or ""
+    if not original:
+        return continuation.strip()
+
+    a = original.rstrip()
+    b = continuation.lstrip()
+    rest = b[overlap_length(a, b):]
+    if not rest.strip():
+        return a
+    if rest[0].isspace():
+        return (a + rest).strip()
+    return (a + " " + rest).strip()
@@ -0,0 +1,248 @@
+"""In-process benchmarks for the generation and rendering hot paths.
+
+Runs against the deterministic OfflineBackend, so no credentials or network are
+needed and the numbers measure our own overhead (orchestration, caching, merging,
+rendering) apart from the model's. Results are printed as JSON for comparing commits:
+
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --latency-ms 200 --iterations 5 --compare bench.json
+    python benchmarks/run.py --only summary_detailed_top_up merge_texts_large
+
+Each case reports wall time (mean/min/p95 per iteration), model calls per iteration,
+briefing-cache hit ratio and peak traced memory.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep benchmark runs away from the real cache and the live API. The app modules
+# read these paths at import time, so the directory is created here and removed
+# when the run finishes (see __main__).
+_BENCH_DIR = tempfile.TemporaryDirectory(prefix="bench-cache-")
+os.environ["BRIEFING_CACHE_PATH"] = os.path.join(_BENCH_DIR.name, "briefings.sqlite3")
+os.environ["NOTES_DB_PATH"] = os.path.join(_BENCH_DIR.name, "notes.sqlite3")
+os.environ["SEARCH_INDEX_PATH"] = os.path.join(_BENCH_DIR.name, "search.sqlite3")
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(_BENCH_DIR.name, "responses.sqlite3")
+os.environ["LLM_BACKEND"] = "offline"
+
+from app import agents  # noqa: E402
+from app.backends import OfflineBackend, get_backend, set_backend  # noqa: E402
+from app.cache import get_briefing_cache  # noqa: E402
+from app.crew_wrapper import CultureCrew  # noqa: E402
+from app.pdf import PDF_SUPPORTED, make_pdf_bytes  # noqa: E402
+from app.utils import looks_cutoff, merge_texts  # noqa: E402
+
+CASES = {}
+
+
+def case(name, cold_cache=False, output_chars=None):
+    """Register a benchmark. `cold_cache` clears the briefing cache before every iteration."""
+    def register(fn):
+        CASES[name] = {"fn": fn, "cold_cache": cold_cache, "output_chars": output_chars}
+        return fn
+    return register
+
+
+# --- generation ---------------------------------------------------------------
+
+for _verbosity in ("concise", "medium", "detailed"):
+    case(f"summary_{_verbosity}_cold", cold_cache=True)(
+        lambda v=_verbosity: agents.generate_culture_summary("Japan", verbosity=v))
+    case(f"summary_{_verbosity}_warm")(
+        lambda v=_verbosity: agents.generate_culture_summary("Japan", verbosity=v))
+
+# Short outputs leave etiquette under 5 points, forcing the _count_points top-up call.
+case("summary_detailed_top_up", cold_cache=True, output_chars=150)(
+    lambda: agents.generate_culture_summary("Japan", verbosity="detailed"))
+
+case("summary_json_mode_cold", cold_cache=True)(
+    lambda: agents.generate_culture_summary("Japan", verbosity="medium", mode="json"))
+
+
+@case("chat_with_persona")
+def _chat():
+    agents.chat_with_persona("Japan", "local expert", "Hello, nice to meet you. How should I greet your parents?")
+
+
+@case("continue_text")
+def _continue():
+    agents.continue_text(LONG_TEXT[:2000])
+
+
+# --- text post-processing -----------------------------------------------------
+
+LONG_TEXT = " ".join(
+    f"Point {i}: greet elders first, remove shoes indoors and offer gifts with both hands." for i in range(400)
+)
+
+
+@case("merge_texts_large")
+def _merge():
+    original = LONG_TEXT
+    # continuation overlaps the tail of the original by ~150 characters
+    merge_texts(original, original[-150:] + " And finally, always thank your host before leaving.")
+
+
+@case("merge_texts_no_overlap")
+def _merge_miss():
+    merge_texts(LONG_TEXT, "Completely new continuation text without any shared prefix at all, " * 20)
+
+
+@case("looks_cutoff_large")
+def _cutoff():
+    for i in range(1000):
+        looks_cutoff(LONG_TEXT[: 200 + i])
+
+
+# --- rendering and notes ------------------------------------------------------
+
+@case("make_pdf_bytes_large")
+def _pdf():
+    if not PDF_SUPPORTED:
+        raise SkipCase("reportlab not installed")
+    make_pdf_bytes("Cultural Summary - Japan", "\n".join(LONG_TEXT.split(". ")))
+
+
+@case("crew_get_notes_5000")
+def _notes():
+    crew = NOTES_CREW
+    # what the Saved Notes tab does for "Download All Notes"
+    "".join(f"Title: {n['title']}\nCulture: {n['culture']}\nSaved: {n['created_at']}\n\n{n['content']}\n\n---\n\n"
+            for n in crew.iter_notes("bench-user"))
+
+
+@case("crew_get_notes_page")
+def _notes_page():
+    # first page, then the next one via the cursor
+    page = NOTES_CREW.get_notes("bench-user", limit=20)
+    NOTES_CREW.get_notes("bench-user", limit=20, cursor=page["next_cursor"])
+
+
+NOTES_CREW = None
+
+
+def _prepare_notes(count: int = 5000):
+    global NOTES_CREW
+    NOTES_CREW = CultureCrew()
+    for i in range(count):
+        NOTES_CREW.save_note("bench-user", "Japan", f"Question {i} about bowing?", {"response": LONG_TEXT[:400]})
+
+
+class SkipCase(Exception):
+    pass
+
+
+# --- runner -------------------------------------------------------------------
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_case(name: str, spec: dict, iterations: int, latency_ms: float) -> dict:
+    backend = OfflineBackend(latency_ms=latency_ms, output_chars=spec["output_chars"] or 600)
+    set_backend(backend)
+    cache = get_briefing_cache()
+    fn = spec["fn"]
+
+    # warm-up iteration (also populates the cache for *_warm cases)
+    try:
+        fn()
+    except SkipCase as e:
+        return {"name": name, "skipped": str(e)}
+
+    timings = []
+    backend.reset_stats()
+    hits, misses = cache.hits, cache.misses
+    tracemalloc.start()
+    for _ in range(iterations):
+        if spec["cold_cache"]:
+            cache.clear()
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    lookups = (cache.hits - hits) + (cache.misses - misses)
+    return {
+        "name": name,
+        "iterations": iterations,
+        "wall_ms": {
+            "mean": round(sum(timings) / len(timings), 3),
+            "min": round(min(timings), 3),
+            "p95": round(_percentile(timings, 95), 3),
+        },
+        "model_calls_per_iter": round(backend.calls / iterations, 2),
+        "cache_hit_ratio": round((cache.hits - hits) / lookups, 3) if lookups else None,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated model latency per call")
+    parser.add_argument("--only", nargs="+", help="run only these cases")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="previous JSON report; adds mean wall-time ratios")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    _prepare_notes()
+    previous_backend = get_backend()
+    try:
+        results = [run_case(n, CASES[n], args.iterations, args.latency_ms) for n in names]
+    finally:
+        set_backend(previous_backend)
+
+    if args.compare:
+        with open(args.compare) as f:
+            before = {r["name"]: r for r in json.load(f).get("results", [])}
+        for r in results:
+            prev = before.get(r["name"], {}).get("wall_ms", {}).get("mean")
+            if prev and "wall_ms" in r:
+                r["mean_vs_previous"] = round(r["wall_ms"]["mean"] / prev, 3)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "latency_ms": args.latency_ms,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    with _BENCH_DIR:
+        status = main()
+    sys.exit(status)
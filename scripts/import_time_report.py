@@ -0,0 +1,101 @@
+"""Report how long importing the app's modules takes, for tracking startup cost across releases.
+
+Runs a fresh interpreter with `python -X importtime`, so results are not skewed by
+modules already imported in this process, and prints a JSON report:
+
+    python scripts/import_time_report.py
+    python scripts/import_time_report.py --modules app.agents app.main --top 15 --output import_times.json
+    python scripts/import_time_report.py --compare import_times.json
+
+With --compare, the previous report's totals are included and the difference is printed.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["app.agents", "app.crew_wrapper", "app.main"]
+
+
+def measure(module: str, runs: int = 3) -> dict:
+    """Import `module` in `runs` fresh interpreters and return the fastest successful run's timings.
+
+    If every run fails, the last failure is returned (with no total) so it is reported.
+    """
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        entries = []
+        for line in proc.stderr.splitlines():
+            # "import time:   self [us] |   cumulative | imported package"
+            if not line.startswith("import time:") or "imported package" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            entries.append({
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+            })
+        target = next((e for e in reversed(entries) if e["module"] == module), None)
+        run = {
+            "module": module,
+            "ok": proc.returncode == 0,
+            "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+            "total_ms": round(target["cumulative_us"] / 1000, 2) if target and proc.returncode == 0 else None,
+            "entries": entries,
+        }
+        if run["total_ms"] is None:
+            if best is None or best["total_ms"] is None:
+                best = run
+        elif best is None or best["total_ms"] is None or run["total_ms"] < best["total_ms"]:
+            best = run
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per module")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module; fastest is kept")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="previous JSON report to diff against")
+    args = parser.parse_args(argv)
+
+    report = {"python": sys.version.split()[0], "modules": {}}
+    for module in args.modules:
+        run = measure(module, runs=args.runs)
+        slowest = sorted((e for e in run["entries"] if e["depth"] <= 1),
+                         key=lambda e: e["cumulative_us"], reverse=True)[: args.top]
+        report["modules"][module] = {
+            "ok": run["ok"],
+            "error": run["error"],
+            "total_ms": run["total_ms"],
+            "slowest": [{"module": e["module"], "cumulative_ms": round(e["cumulative_us"] / 1000, 2)}
+                        for e in slowest],
+        }
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        for module, current in report["modules"].items():
+            before = previous.get("modules", {}).get(module, {}).get("total_ms")
+            current["previous_total_ms"] = before
+            if before is not None and current["total_ms"] is not None:
+                current["delta_ms"] = round(current["total_ms"] - before, 2)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0 if all(m["ok"] for m in report["modules"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
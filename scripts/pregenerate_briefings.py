@@ -0,0 +1,116 @@
+"""Pre-generate briefings for every country and verbosity and write a briefing snapshot.
+
+Runs each (culture, verbosity) pair through `generate_culture_summary`, appending
+finished briefings to a JSONL progress file so an interrupted run picks up where it
+stopped, then writes the versioned snapshot that app/main.py and app.py memory-map
+at startup (see app/snapshot.py):
+
+    python scripts/pregenerate_briefings.py --rpm 30
+    python scripts/pregenerate_briefings.py --cultures Japan India --verbosities medium
+    BRIEFING_SNAPSHOT_PATH=.cache/briefings.snapshot uvicorn app.main:app
+
+Model calls go through the process-wide limiter, so --rpm caps the paid request rate.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_OUTPUT = os.path.join(".cache", "briefings.snapshot")
+VERBOSITIES = ("concise", "medium", "detailed")
+
+
+def _load_progress(path: str) -> dict:
+    """Read briefings already finished by a previous run; tolerates a truncated last line."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+                done[(row["culture"], row["verbosity"])] = row["result"]
+            except (ValueError, KeyError):
+                continue
+    return done
+
+
+def _generate(culture: str, verbosity: str, mode: str, retries: int) -> dict:
+    from app.agents import generate_culture_summary
+
+    for attempt in range(retries + 1):
+        try:
+            return generate_culture_summary(culture, verbosity=verbosity, mode=mode)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = getattr(e, "retry_after", None) or min(60, 2 ** attempt * 5)
+            print(f"  {culture} ({verbosity}) failed: {e}; retrying in {delay}s", file=sys.stderr)
+            time.sleep(delay)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=os.getenv("BRIEFING_SNAPSHOT_PATH") or DEFAULT_OUTPUT)
+    parser.add_argument("--progress", help="JSONL progress file (default: <output>.progress.jsonl)")
+    parser.add_argument("--cultures", nargs="+", help="cultures to generate (default: every known country)")
+    parser.add_argument("--verbosities", nargs="+", default=list(VERBOSITIES), choices=VERBOSITIES)
+    parser.add_argument("--mode", help="briefing mode (default: $BRIEFING_MODE or legacy)")
+    parser.add_argument("--rpm", type=float, help="model requests per minute (overrides $GEMINI_RPM)")
+    parser.add_argument("--retries", type=int, default=3, help="retries per briefing before giving up")
+    args = parser.parse_args(argv)
+
+    if args.rpm:
+        os.environ["GEMINI_RPM"] = str(args.rpm)
+    # a batch job would rather wait for capacity than be turned away
+    os.environ.setdefault("GEMINI_MAX_WAIT_SECONDS", "600")
+
+    from app.agents import DEFAULT_BRIEFING_MODE, get_model_name
+    from app.cultures import CANONICAL_CULTURES, canonicalize_culture
+    from app.snapshot import SNAPSHOT_VERSION, write_snapshot
+
+    mode = args.mode or DEFAULT_BRIEFING_MODE
+    cultures = [canonicalize_culture(c) for c in args.cultures] if args.cultures else list(CANONICAL_CULTURES)
+    progress_path = args.progress or f"{args.output}.progress.jsonl"
+    done = _load_progress(progress_path)
+    todo = [(c, v) for c in cultures for v in args.verbosities if (c, v) not in done]
+    print(f"{len(done)} briefings already done, {len(todo)} to generate.")
+
+    failed = []
+    os.makedirs(os.path.dirname(os.path.abspath(progress_path)), exist_ok=True)
+    with open(progress_path, "a", encoding="utf-8") as progress:
+        for i, (culture, verbosity) in enumerate(todo, 1):
+            try:
+                result = _generate(culture, verbosity, mode, args.retries)
+            except Exception as e:
+                print(f"[{i}/{len(todo)}] {culture} ({verbosity}) failed: {e}", file=sys.stderr)
+                failed.append((culture, verbosity))
+                continue
+            done[(culture, verbosity)] = result
+            progress.write(json.dumps({"culture": culture, "verbosity": verbosity, "result": result}) + "\n")
+            progress.flush()
+            print(f"[{i}/{len(todo)}] {culture} ({verbosity})")
+
+    wanted = {(c, v) for c in cultures for v in args.verbosities}
+    entries = {k: v for k, v in done.items() if k in wanted}
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "model": get_model_name(),
+        "mode": mode,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    count = write_snapshot(args.output, entries, meta)
+    print(f"Wrote {count} briefings to {args.output}.")
+    if failed:
+        print(f"{len(failed)} briefings failed; rerun to retry them.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
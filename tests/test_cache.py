@@ -0,0 +1,24 @@
+from app.cache import BriefingCache
+
+
+def _accessed_at(cache, key):
+    return cache._connect().execute("SELECT accessed_at FROM entries WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_refresh_access_time_at_most_once_per_interval(tmp_path):
+    cache = BriefingCache(str(tmp_path / "cache.sqlite3"), touch_interval_seconds=60)
+    cache.set("k", {"text": "value"})
+    stored = _accessed_at(cache, "k")
+    assert cache.get("k") == {"text": "value"}
+    assert _accessed_at(cache, "k") == stored
+
+    cache._connect().execute("UPDATE entries SET accessed_at = accessed_at - 120 WHERE key = 'k'")
+    assert cache.get("k") == {"text": "value"}
+    assert _accessed_at(cache, "k") > stored - 120
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = BriefingCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=-1)
+    cache.set("k", "value")
+    assert cache.get("k") is None
+    assert cache.hit_ratio() == 0.0
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from app.limiter import GeminiLimiter, RateLimitExceeded
+
+
+def test_full_queue_is_rejected():
+    limiter = GeminiLimiter(max_concurrency=1, requests_per_minute=6000, max_queue=0)
+    limiter.acquire()
+    try:
+        with pytest.raises(RateLimitExceeded) as exc:
+            limiter.acquire()
+        assert exc.value.retry_after >= 1
+        assert limiter.saturated
+    finally:
+        limiter.release()
+
+
+def test_wait_times_out():
+    limiter = GeminiLimiter(max_concurrency=1, requests_per_minute=6000, max_wait_seconds=0.05)
+    limiter.acquire()
+    try:
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire()
+    finally:
+        limiter.release()
+
+
+def test_tokens_refill_over_time():
+    # 6000 per minute is one token every 10 ms
+    limiter = GeminiLimiter(max_concurrency=4, requests_per_minute=6000, burst=1, max_wait_seconds=1)
+    with limiter.slot():
+        pass
+    started = time.monotonic()
+    with limiter.slot():
+        pass
+    assert time.monotonic() - started >= 0.005
+
+
+def test_empty_bucket_rejects_when_refill_is_too_slow():
+    limiter = GeminiLimiter(requests_per_minute=1, burst=1, max_wait_seconds=0.05)
+    with limiter.slot():
+        pass
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.acquire()
+    assert exc.value.retry_after > 1
+
+
+def test_reservation_is_all_or_nothing_and_refunds_unused_calls():
+    limiter = GeminiLimiter(requests_per_minute=1, burst=3, max_wait_seconds=1)
+    with pytest.raises(RateLimitExceeded):
+        limiter.reserve(5)
+    reservation = limiter.reserve(3)
+    assert reservation.delay == 0
+
+    def two_calls():
+        for _ in range(2):
+            with limiter.slot():
+                pass
+
+    reservation.run(two_calls)  # paid for already, so no waiting on the empty bucket
+    assert reservation.remaining == 1
+    reservation.close()
+    assert limiter.reserve(1).delay == 0
@@ -0,0 +1,45 @@
+import pytest
+
+from app.notes_store import NotesStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = NotesStore(str(tmp_path / "notes.sqlite3"))
+    # two notes share a timestamp so the id tie-breaker is exercised
+    for i, created_at in enumerate(["2024-01-01T00:00:00", "2024-01-02T00:00:00", "2024-01-02T00:00:00",
+                                    "2024-01-03T00:00:00", "2024-01-04T00:00:00"]):
+        store.add("ana", "Japan" if i % 2 else "France", f"note {i}", f"content {i}", created_at)
+    store.add("ben", "Japan", "other user", "content", "2024-01-01T00:00:00")
+    return store
+
+
+def _all_pages(store, **kwargs):
+    titles, cursor = [], None
+    while True:
+        notes, cursor = store.page("ana", cursor=cursor, **kwargs)
+        titles.extend(note["title"] for note in notes)
+        if cursor is None:
+            return titles
+
+
+def test_pages_are_ordered_and_disjoint(store):
+    assert _all_pages(store, limit=2) == [f"note {i}" for i in range(5)]
+
+
+def test_cursor_is_stable_when_notes_are_added(store):
+    first, cursor = store.page("ana", limit=2)
+    store.add("ana", "France", "older note", "content", "2023-12-31T00:00:00")
+    store.add("ana", "France", "newer note", "content", "2024-02-01T00:00:00")
+    rest, _ = store.page("ana", limit=10, cursor=cursor)
+    assert [n["title"] for n in first + rest] == [f"note {i}" for i in range(5)] + ["newer note"]
+
+
+def test_culture_filter_and_iter_notes(store):
+    assert _all_pages(store, limit=1, culture="Japan") == ["note 1", "note 3"]
+    assert [n["title"] for n in store.iter_notes("ana", batch_size=2)] == [f"note {i}" for i in range(5)]
+
+
+def test_invalid_cursor_raises_value_error(store):
+    with pytest.raises(ValueError):
+        store.page("ana", cursor="not-a-cursor")
@@ -0,0 +1,39 @@
+from app.similarity import NearDuplicateIndex
+
+WINE = "Is it rude to bring wine to a dinner party in France?"
+WINE_REWORDED = "Is it rude to bring wine to the dinner party in France?"
+NO_WINE = "Is it rude to not bring wine to a dinner party in France?"
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    index = NearDuplicateIndex()
+    index.add(WINE, "answer")
+    assert index.lookup("is it rude to bring wine to a dinner party in france") == ("answer", 1.0)
+
+
+def test_near_duplicate_respects_threshold():
+    loose = NearDuplicateIndex(threshold=0.6)
+    loose.add(WINE, "answer")
+    value, score = loose.lookup(WINE_REWORDED)
+    assert value == "answer" and 0.6 <= score < 1.0
+
+    strict = NearDuplicateIndex(threshold=0.99)
+    strict.add(WINE, "answer")
+    assert strict.lookup(WINE_REWORDED) is None
+
+
+def test_negation_does_not_match():
+    index = NearDuplicateIndex(threshold=0.5)
+    index.add(WINE, "answer")
+    assert index.lookup(NO_WINE) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    index = NearDuplicateIndex(max_entries=2)
+    index.add("greetings in japan", 1)
+    index.add("tipping in france", 2)
+    index.lookup("greetings in japan")  # now the most recently used
+    index.add("gifts in china", 3)
+    assert index.lookup("tipping in france") is None
+    assert index.lookup("greetings in japan") == (1, 1.0)
+    assert index.lookup("gifts in china") == (3, 1.0)
@@ -0,0 +1,41 @@
+from app.utils import MIN_CHAR_OVERLAP, merge_texts, overlap_length
+
+
+def test_no_overlap_joins_with_a_space():
+    assert overlap_length("The meal starts at eight.", "Guests bring flowers.") == 0
+    assert merge_texts("The meal starts at eight.", "Guests bring flowers.") == \
+        "The meal starts at eight. Guests bring flowers."
+
+
+def test_repeated_tail_is_dropped():
+    original = "Bow slightly when greeting elders and wait"
+    continuation = "and wait to be seated by the host."
+    assert overlap_length(original, continuation) == len("and wait")
+    assert merge_texts(original, continuation) == \
+        "Bow slightly when greeting elders and wait to be seated by the host."
+
+
+def test_overlap_ignores_case_and_whitespace():
+    assert merge_texts("Remove your shoes  at the door", "at THE\ndoor before entering.") == \
+        "Remove your shoes  at the door before entering."
+
+
+def test_continuation_contained_in_original():
+    original = "Tipping is not expected in restaurants."
+    assert merge_texts(original, "in restaurants.") == original
+    assert merge_texts(original, original) == original
+
+
+def test_short_overlap_must_fall_on_word_boundaries():
+    # "ea" ends "tea" and starts "each", but it is not a repeated word
+    assert overlap_length("Offer tea", "each guest a cup.") == 0
+    long_fragment = "x" * MIN_CHAR_OVERLAP
+    assert overlap_length("prefix" + long_fragment, long_fragment + " suffix") == MIN_CHAR_OVERLAP
+
+
+def test_empty_inputs():
+    assert overlap_length("", "anything") == 0
+    assert overlap_length("anything", "") == 0
+    assert merge_texts("", "  Only the continuation ") == "Only the continuation"
+    assert merge_texts("Only the original", "") == "Only the original"
+    assert merge_texts("", "") == ""